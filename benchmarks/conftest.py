@@ -0,0 +1,124 @@
+"""
+Seeds an SQLite database of realistic size for the benchmarks. The sizes are
+given with ``--rows``, and the same database grows from one size to the next,
+so the smallest sizes run first.
+"""
+import tracemalloc
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django_consent import models
+from django_consent import utils
+
+#: Sources the consent is spread over
+SOURCES = 10
+
+BATCH_SIZE = 10000
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--rows",
+        default="10000",
+        help="Comma-separated numbers of consents to benchmark with, "
+        "for instance 10000,100000,1000000",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "dataset" in metafunc.fixturenames:
+        rows = sorted(int(n) for n in metafunc.config.getoption("rows").split(","))
+        metafunc.parametrize("dataset", rows, indirect=True, scope="session")
+
+
+def get_email(number):
+    return "user{}@example.com".format(number)
+
+
+def _seed_batch(sources, start, stop):
+    User = get_user_model()
+    # IDs are set explicitly, since SQLite doesn't return them from bulk_create
+    User.objects.bulk_create(
+        User(id=i + 1, username="user{}".format(i), email=get_email(i), password="!")
+        for i in range(start, stop)
+    )
+    consents = [
+        models.UserConsent(
+            id=i + 1,
+            user_id=i + 1,
+            source=sources[i % SOURCES],
+            email_hash=utils.get_email_hash(get_email(i)),
+            # One in ten hasn't confirmed the email yet
+            email_confirmed=i % 10 != 0,
+        )
+        for i in range(start, stop)
+    ]
+    models.UserConsent.objects.bulk_create(consents)
+    # One in twenty opted out, and one in a hundred opted out of everything
+    models.EmailOptOut.objects.bulk_create(
+        models.EmailOptOut(
+            user_id=consent.user_id,
+            consent=consent,
+            email_hash=consent.email_hash,
+            is_everything=consent.id % 100 == 0,
+        )
+        for consent in consents
+        if consent.id % 20 == 0
+    )
+
+
+def seed(rows):
+    """
+    Adds consents, users and opt-outs until there are ``rows`` consents
+    """
+    sources = list(models.ConsentSource.objects.order_by("pk"))
+    for number in range(len(sources), SOURCES):
+        sources.append(
+            models.ConsentSource.objects.create(
+                source_name="Source {}".format(number),
+                definition="Benchmarking",
+                requires_confirmed_email=True,
+            )
+        )
+    existing = models.UserConsent.objects.count()
+    for start in range(existing, rows, BATCH_SIZE):
+        _seed_batch(sources, start, min(start + BATCH_SIZE, rows))
+    return sources
+
+
+@pytest.fixture(scope="session")
+def dataset(request, django_db_setup, django_db_blocker):
+    """
+    The consent sources of a database with ``request.param`` consents
+    """
+    with django_db_blocker.unblock():
+        return seed(request.param)
+
+
+@pytest.fixture
+def measure(benchmark, db):
+    """
+    Benchmarks a function, and stores the number of queries and the peak
+    memory of one extra call, which is rolled back, in the saved results
+    """
+
+    def run(func, *args, **kwargs):
+        # Measured in a single call, which is rolled back so it doesn't change
+        # the data that is benchmarked
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                tracemalloc.start()
+                try:
+                    func(*args, **kwargs)
+                    __, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+            transaction.set_rollback(True)
+        benchmark.extra_info["queries"] = len(queries)
+        benchmark.extra_info["peak_memory_kib"] = peak // 1024
+        return benchmark(func, *args, **kwargs)
+
+    return run
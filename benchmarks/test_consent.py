@@ -0,0 +1,71 @@
+import itertools
+
+from django_consent import emails
+from django_consent import models
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+
+def get_consent(dataset):
+    # A confirmed consent from the middle of the table, see conftest.seed()
+    pk = models.UserConsent.objects.count() // 2 + 2
+    return models.UserConsent.objects.select_related("user", "source").get(pk=pk)
+
+
+def test_get_valid_consent_count(dataset, measure):
+    source = dataset[0]
+    measure(lambda: source.get_valid_consent().count())
+
+
+def test_get_valid_consent_page(dataset, measure):
+    source = dataset[0]
+    measure(lambda: list(source.get_valid_consent().order_by("pk")[:100]))
+
+
+def test_iter_recipients(dataset, measure):
+    source = dataset[0]
+    measure(lambda: sum(1 for __ in source.iter_recipients()))
+
+
+def test_is_valid(dataset, measure):
+    consent = get_consent(dataset)
+    measure(consent.is_valid)
+
+
+def test_capture_email_consent(dataset, measure):
+    source = dataset[0]
+    numbers = itertools.count()
+
+    def capture():
+        email = "new{}@example.com".format(next(numbers))
+        models.UserConsent.capture_email_consent(source, email)
+
+    measure(capture)
+
+
+def test_capture_email_consent_existing_user(dataset, measure):
+    consent = get_consent(dataset)
+    source = dataset[1]
+    measure(models.UserConsent.capture_email_consent, source, consent.email)
+
+
+def test_token_round_trip(dataset, measure):
+    consent = get_consent(dataset)
+    salt = consent_settings.UNSUBSCRIBE_SALT
+
+    def round_trip():
+        token = utils.get_consent_token(consent, salt=salt)
+        assert utils.get_token_email_hash(token, consent.id, salt)
+
+    measure(round_trip)
+
+
+def test_render_confirmation_email(dataset, measure):
+    consent = get_consent(dataset)
+    measure(emails.ConfirmationNeededEmail, user=consent.user, consent=consent)
+
+
+def test_render_confirmation_email_batch(dataset, measure):
+    consent = get_consent(dataset)
+    batch = emails.EmailBatch(emails.ConfirmationNeededEmail)
+    measure(batch.create, user=consent.user, consent=consent)
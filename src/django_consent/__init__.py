@@ -0,0 +1,5 @@
+import django
+
+if django.VERSION < (3, 2):
+    # Connects the signals, see DjangoConsentConfig.ready()
+    default_app_config = "django_consent.apps.DjangoConsentConfig"
@@ -1,8 +1,220 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
+from . import cache
+from . import exports
 from . import models
+from . import utils
+
+#: Consent counts of all sources, counted at most every 5 minutes
+source_counts = cache.LocalCache(max_size=1, timeout=300)
+
+
+def get_estimated_count(model, using):
+    """
+    Returns the database's estimate of the number of rows of a table, or
+    ``None`` if the database doesn't have one
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL returns -1 for tables that were never analyzed
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the database's estimate of the table size when a changelist isn't
+    filtered, instead of counting millions of rows
+    """
+
+    #: Below this many rows, the estimate isn't used
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = get_estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        return super().count
+
+
+class EmailHashSearchMixin:
+    """
+    Searches for an email by its hash, which uses an index, instead of
+    ``LIKE`` on the joined user table. Numbers are looked up as IDs.
+    """
+
+    search_fields = ["email_hash"]
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(pk=search_term), False
+        return queryset.filter(email_hash=utils.get_email_hash(search_term)), False
+
+
+class LargeTableMixin:
+    paginator = EstimatedCountPaginator
+    # Avoids counting the whole table next to the filtered count
+    show_full_result_count = False
+
+
+class ExportMixin:
+    """
+    Admin actions downloading the valid consent of the selected objects
+    """
+
+    actions = ["export_csv", "export_jsonl"]
+
+    def export(self, queryset, export_format):
+        return exports.get_export_response(
+            exports.iter_recipients(queryset.order_by("pk")),
+            self.model._meta.model_name,
+            export_format,
+        )
+
+    def export_csv(self, request, queryset):
+        return self.export(queryset, "csv")
+
+    export_csv.short_description = "Export valid consent as CSV"
+
+    def export_jsonl(self, request, queryset):
+        return self.export(queryset, "jsonl")
+
+    export_jsonl.short_description = "Export valid consent as JSON lines"
+
+
+class ConsentSourceTranslationInline(admin.TabularInline):
+    model = models.ConsentSourceTranslation
+    extra = 0
 
 
 @admin.register(models.ConsentSource)
-class ConsentSourceAdmin(admin.ModelAdmin):
-    pass
+class ConsentSourceAdmin(ExportMixin, admin.ModelAdmin):
+    list_display = [
+        "source_name",
+        "auto_create_id",
+        "requires_confirmed_email",
+        "requires_active_user",
+        "total_count",
+        "valid_count",
+        "opted_out_count",
+    ]
+    readonly_fields = ["auto_create_id"]
+    search_fields = ["source_name"]
+    inlines = [ConsentSourceTranslationInline]
+
+    def get_counts(self):
+        counts = source_counts.get("counts")
+        if counts is cache.MISSING:
+            counts = models.UserConsent.objects.count_by_source()
+            source_counts.set("counts", counts)
+        return counts
+
+    def _get_count(self, obj, name):
+        return self.get_counts().get(obj.pk, {}).get(name, 0)
+
+    def total_count(self, obj):
+        return self._get_count(obj, "total")
+
+    total_count.short_description = "consents"
+
+    def valid_count(self, obj):
+        return self._get_count(obj, "valid")
+
+    valid_count.short_description = "valid"
+
+    def opted_out_count(self, obj):
+        return self._get_count(obj, "opted_out")
+
+    opted_out_count.short_description = "opted out"
+
+
+@admin.register(models.UserConsent)
+class UserConsentAdmin(EmailHashSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = ["id", "email", "source", "email_confirmed", "created"]
+    list_filter = ["source", "email_confirmed"]
+    list_select_related = ["user", "source"]
+    raw_id_fields = ["user"]
+    readonly_fields = ["email_hash", "email_confirmation_requested"]
+    actions = ["confirm", "optout"]
+
+    def confirm(self, request, queryset):
+        updated = queryset.confirm()
+        self.message_user(request, "{} consents confirmed".format(updated))
+
+    confirm.short_description = "Confirm selected consent"
+
+    def optout(self, request, queryset):
+        created = queryset.optout()
+        self.message_user(request, "{} opt-outs created".format(created))
+
+    optout.short_description = "Opt out of selected consent"
+
+
+@admin.register(models.EmailOptOut)
+class EmailOptOutAdmin(EmailHashSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = [
+        "id",
+        "email_hash",
+        "user",
+        "consent_id",
+        "is_everything",
+        "created",
+    ]
+    list_filter = ["is_everything"]
+    list_select_related = ["user"]
+    raw_id_fields = ["user", "consent"]
+
+
+@admin.register(models.EmailCampaign)
+class EmailCampaignAdmin(ExportMixin, admin.ModelAdmin):
+    list_display = ["name", "created"]
+    filter_horizontal = ["consent"]
+
+
+@admin.register(models.ConsentRecipient)
+class ConsentRecipientAdmin(EmailHashSearchMixin, LargeTableMixin, admin.ModelAdmin):
+    list_display = ["consent_id", "source", "email_hash", "is_sendable"]
+    list_filter = ["source", "is_sendable"]
+    list_select_related = ["source"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.OutgoingEmail)
+class OutgoingEmailAdmin(LargeTableMixin, admin.ModelAdmin):
+    list_display = ["id", "consent_id", "email_type", "created", "sent", "attempts"]
+    list_filter = ["email_type"]
+    raw_id_fields = ["consent"]
+    readonly_fields = ["claim_token", "claimed_until", "last_error"]
+
+
+@admin.register(models.ConsentStatistics)
+class ConsentStatisticsAdmin(admin.ModelAdmin):
+    list_display = ["source", "bucket"] + models.ConsentStatistics.COUNTERS
+    list_filter = ["source"]
+    list_select_related = ["source"]
+    date_hierarchy = "bucket"
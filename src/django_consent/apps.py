@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class DjangoConsentConfig(AppConfig):
+    name = "django_consent"
+    verbose_name = "Consent"
+    default_auto_field = "django.db.models.AutoField"
+
+    def ready(self):
+        from . import metrics
+        from . import seeding
+        from . import signals
+
+        signals.connect()
+        metrics.instrument()
+        post_migrate.connect(seeding.post_migrate_seed, sender=self)
@@ -0,0 +1,38 @@
+"""
+Same as ``django_consent.urls`` with the views from
+:mod:`django_consent.async_views`
+"""
+from django.urls import path
+
+from . import async_views
+
+app_name = "consent"
+
+
+urlpatterns = [
+    path(
+        "subscribe/<int:pk>/<str:token>/",
+        async_views.AsyncConsentConfirmationReceiveView.as_view(),
+        name="consent_confirm",
+    ),
+    path(
+        "unsubscribe/<int:pk>/<str:token>/",
+        async_views.AsyncConsentWithdrawView.as_view(),
+        name="unsubscribe",
+    ),
+    path(
+        "unsubscribe/<int:pk>/<str:token>/undo/",
+        async_views.AsyncConsentWithdrawUndoView.as_view(),
+        name="unsubscribe_undo",
+    ),
+    path(
+        "unsubscribe-all/<int:pk>/<str:token>/",
+        async_views.AsyncConsentWithdrawAllView.as_view(),
+        name="unsubscribe_all",
+    ),
+    path(
+        "unsubscribe-all/<int:pk>/<str:token>/undo/",
+        async_views.AsyncConsentWithdrawAllUndoView.as_view(),
+        name="unsubscribe_all_undo",
+    ),
+]
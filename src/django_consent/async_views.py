@@ -0,0 +1,116 @@
+"""
+Async versions of the views in :mod:`django_consent.views` for projects served
+with ASGI, mounted with ``django_consent.async_urls``.
+
+Django 3.2 doesn't have an async ORM, so the queries of a request, including
+the rate limit check, are run together in one call to ``sync_to_async``.
+Tokens are validated and templates are rendered in the event loop.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.http.response import Http404
+from django.template.loader import render_to_string
+
+from . import utils
+from . import views
+
+
+class AsyncViewMixin:
+    """
+    Makes a class-based view with ``async def`` handlers usable in an async
+    urlconf.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return functools.wraps(view)(async_view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Views check the rate limit in the same thread as their queries
+        method = request.method.lower()
+        if method not in self.http_method_names or not hasattr(self, method):
+            return self.http_method_not_allowed(request, *args, **kwargs)
+        return await getattr(self, method)(request, *args, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        # A TemplateResponse would be rendered by the handler in a thread
+        response_kwargs.setdefault("content_type", self.content_type)
+        return HttpResponse(
+            render_to_string(self.get_template_names(), context, self.request),
+            **response_kwargs
+        )
+
+
+class AsyncConsentCreateView(AsyncViewMixin, views.ConsentCreateView):
+    """
+    Async version of :class:`~django_consent.views.ConsentCreateView`
+    """
+
+    def handle(self, request, *args, **kwargs):
+        self.check_ratelimit(request)
+        handler = getattr(super(AsyncViewMixin, self), request.method.lower())
+        return handler(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(self.handle)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.handle)(request, *args, **kwargs)
+
+
+class AsyncUserConsentActionView(AsyncViewMixin, views.UserConsentActionView):
+    """
+    Async version of :class:`~django_consent.views.UserConsentActionView`. The
+    consent is loaded with its user so the templates don't query the database.
+    """
+
+    def handle(self, request, email_hash):
+        self.check_ratelimit(request)
+        if email_hash is None:
+            return None
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        return self.action(self.get_queryset().filter(pk=pk, email_hash=email_hash))
+
+    async def get(self, request, *args, **kwargs):
+        email_hash = utils.get_token_email_hash(
+            kwargs.get("token"), kwargs.get(self.pk_url_kwarg), salt=self.token_salt
+        )
+        self.object = await sync_to_async(self.handle)(request, email_hash)
+        if self.object is None:
+            raise Http404("This does not work")
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+class AsyncConsentWithdrawView(AsyncUserConsentActionView, views.ConsentWithdrawView):
+    pass
+
+
+class AsyncConsentWithdrawUndoView(
+    AsyncUserConsentActionView, views.ConsentWithdrawUndoView
+):
+    pass
+
+
+class AsyncConsentWithdrawAllView(
+    AsyncUserConsentActionView, views.ConsentWithdrawAllView
+):
+    pass
+
+
+class AsyncConsentWithdrawAllUndoView(
+    AsyncUserConsentActionView, views.ConsentWithdrawAllUndoView
+):
+    pass
+
+
+class AsyncConsentConfirmationReceiveView(
+    AsyncUserConsentActionView, views.ConsentConfirmationReceiveView
+):
+    pass
@@ -0,0 +1,51 @@
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import settings as consent_settings
+from . import suppression
+
+
+class ConsentEmailBackend(BaseEmailBackend):
+    """
+    An email backend which removes recipients who opted out of everything
+    before handing messages to the backend in ``settings.CONSENT_EMAIL_BACKEND``.
+
+    This catches opt-outs made after a list of recipients was built, as well
+    as opt-outs that are only stored as an email hash. Recipients are checked
+    against an in-memory :class:`~django_consent.suppression.SuppressionIndex`,
+    so there are no queries per message.
+
+    Messages with ``respect_optouts = False``, like confirmations of a new
+    signup, are sent unchanged.
+
+    To use it::
+
+        EMAIL_BACKEND = "django_consent.backends.ConsentEmailBackend"
+        CONSENT_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+    """
+
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.backend = get_connection(
+            consent_settings.EMAIL_BACKEND, fail_silently=fail_silently, **kwargs
+        )
+
+    def open(self):
+        return self.backend.open()
+
+    def close(self):
+        return self.backend.close()
+
+    def send_messages(self, email_messages):
+        index = suppression.get_index()
+        messages = []
+        for message in email_messages:
+            if getattr(message, "respect_optouts", True):
+                message.to = [a for a in message.to if a not in index]
+                message.cc = [a for a in message.cc if a not in index]
+                message.bcc = [a for a in message.bcc if a not in index]
+            if message.recipients():
+                messages.append(message)
+        if not messages:
+            return 0
+        return self.backend.send_messages(messages)
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+#: Returned when a key isn't cached, since ``None`` may be a cached value
+MISSING = object()
+
+
+class LocalCache:
+    """
+    A cache in the memory of the current process, holding at most ``max_size``
+    items. The least recently used items are evicted first, and items expire
+    after ``timeout`` seconds unless it's ``None``.
+    """
+
+    def __init__(self, max_size=1000, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                return default
+            if expires is not None and expires < time.monotonic():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout else None
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._items.pop(key, None)
+
+    def delete_matching(self, predicate):
+        with self._lock:
+            for key in [key for key in self._items if predicate(key)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class TieredCache:
+    """
+    A :class:`LocalCache` in front of an optional Django cache backend shared
+    by all processes. Keys are tuples, which are joined to strings for the
+    shared backend.
+
+    Since other processes are not told about deleted keys, their local copies
+    are only refreshed when they expire.
+    """
+
+    def __init__(self, prefix, max_size=1000, timeout=300, backend=None):
+        self.prefix = prefix
+        self.local = LocalCache(max_size=max_size, timeout=timeout)
+        self.timeout = timeout
+        self.backend = backend
+
+    def _shared_key(self, key):
+        return ":".join(str(part) for part in (self.prefix,) + key)
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is MISSING and self.backend:
+            value = caches[self.backend].get(self._shared_key(key), MISSING)
+            if value is not MISSING:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.backend:
+            caches[self.backend].set(self._shared_key(key), value, self.timeout)
+
+    def delete_many(self, keys):
+        self.local.delete_many(keys)
+        if self.backend:
+            caches[self.backend].delete_many([self._shared_key(k) for k in keys])
+
+    def clear(self):
+        self.local.clear()
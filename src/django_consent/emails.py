@@ -14,10 +14,14 @@ class BaseEmail(EmailMessage):
     template = "consent/email/base.txt"
     subject_template = "consent/email/base_subject.txt"
 
+    #: Checked by :class:`~django_consent.backends.ConsentEmailBackend`
+    respect_optouts = True
+
     def __init__(self, *args, **kwargs):
         self.context = kwargs.pop("context", {})
         self.user = kwargs.pop("user", None)
         self.request = kwargs.pop("request", None)
+        self.batch = kwargs.pop("batch", None)
         if self.user:
             kwargs["to"] = [self.user.email]
             self.context["user"] = self.user
@@ -32,24 +36,42 @@ class BaseEmail(EmailMessage):
         self.body = self.get_body()
         self.subject = self.get_subject()
 
+    @staticmethod
+    def get_site_context(request=None):
+        """
+        Returns the part of the context which is the same for all emails
+        """
+        site = get_current_site(request)
+        return {
+            "request": request,
+            "domain": site.domain,
+            "site_name": site.name,
+            "protocol": "https" if not settings.DEBUG else "http",
+        }
+
     def get_context_data(self):
         c = self.context
-        site = get_current_site(self.request)
-        c["request"] = self.request
-        c["domain"] = site.domain
-        c["site_name"] = site.name
-        c["protocol"] = "https" if not settings.DEBUG else "http"
+        if self.batch:
+            c.update(self.batch.site_context)
+        else:
+            c.update(self.get_site_context(self.request))
         return c
 
     def get_body(self):
-        return loader.render_to_string(self.template, self.get_context_data())
+        if self.batch:
+            template = self.batch.template
+        else:
+            template = loader.get_template(self.template)
+        return template.render(self.get_context_data())
 
     def get_subject(self):
+        if self.batch:
+            template = self.batch.subject_template
+        else:
+            template = loader.get_template(self.subject_template)
         # Remember the .strip() as templates often have dangling newlines which
         # are not accepted as subject lines
-        return loader.render_to_string(
-            self.subject_template, self.get_context_data()
-        ).strip()
+        return template.render(self.get_context_data()).strip()
 
     def send_with_feedback(self, success_msg=None):
         if not success_msg:
@@ -72,6 +94,9 @@ class ConfirmationNeededEmail(BaseEmail):
     template = "consent/email/confirmation.txt"
     subject_template = "consent/email/confirmation_subject.txt"
 
+    # Someone who opted out of everything may sign up again
+    respect_optouts = False
+
     def __init__(self, *args, **kwargs):
 
         self.consent = kwargs.pop("consent")
@@ -81,3 +106,44 @@ class ConfirmationNeededEmail(BaseEmail):
         c = super().get_context_data()
         c["consent"] = self.consent
         return c
+
+
+class EmailBatch:
+    """
+    Creates many emails of the same class, for instance for a campaign. The
+    site and the templates are looked up once for the whole batch, so each
+    email only renders its own context::
+
+        batch = EmailBatch(ConfirmationNeededEmail)
+        messages = [batch.create(user=c.user, consent=c) for c in consents]
+
+    Emails are rendered in the language that is active when they're created,
+    see :func:`group_by_language`.
+    """
+
+    def __init__(self, email_class, request=None):
+        self.email_class = email_class
+        self.request = request
+        self.site_context = email_class.get_site_context(request)
+        self.template = loader.get_template(email_class.template)
+        self.subject_template = loader.get_template(email_class.subject_template)
+
+    def create(self, **kwargs):
+        return self.email_class(request=self.request, batch=self, **kwargs)
+
+
+def group_by_language(items, get_language):
+    """
+    Groups items by the language returned by ``get_language(item)``, so that
+    the language only has to be activated once per group::
+
+        for language, recipients in group_by_language(recipients, get_language):
+            with translation.override(language):
+                ...
+
+    :returns: A list of ``(language, items)`` tuples
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(get_language(item), []).append(item)
+    return list(groups.items())
@@ -0,0 +1,73 @@
+"""
+Streams recipients as CSV or JSON lines, writing each row as it's read from
+the database. Used by the ``consent_export`` command and the admin.
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+#: Columns of the exported rows, attributes of
+#: :class:`~django_consent.utils.Recipient`
+FIELDS = ["consent_id", "email", "email_hash", "name"]
+
+
+class _Echo:
+    """
+    A file-like object which returns what is written, for ``csv.writer``
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(recipients):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for recipient in recipients:
+        yield writer.writerow([getattr(recipient, field) or "" for field in FIELDS])
+
+
+def iter_jsonl(recipients):
+    for recipient in recipients:
+        row = {field: getattr(recipient, field) for field in FIELDS}
+        row["email_hash"] = str(row["email_hash"])
+        yield json.dumps(row) + "\n"
+
+
+#: Functions yielding the lines of each format, and their content type
+FORMATS = {
+    "csv": (iter_csv, "text/csv"),
+    "jsonl": (iter_jsonl, "application/jsonl"),
+}
+
+
+def iter_export(recipients, export_format="csv"):
+    """
+    Yields the lines of ``recipients`` in ``export_format``
+    """
+    return FORMATS[export_format][0](recipients)
+
+
+def iter_recipients(objects, chunk_size=2000):
+    """
+    Chains the recipients of several sources or campaigns. A recipient with
+    consent from several of them is exported once for each.
+    """
+    for obj in objects:
+        yield from obj.iter_recipients(chunk_size=chunk_size)
+
+
+def get_export_response(recipients, filename, export_format="csv"):
+    """
+    Returns a ``StreamingHttpResponse`` downloading ``recipients``. The download
+    starts right away, and rows are read from the database as it proceeds.
+    """
+    response = StreamingHttpResponse(
+        iter_export(recipients, export_format),
+        content_type=FORMATS[export_format][1],
+    )
+    response["Content-Disposition"] = 'attachment; filename="{}.{}"'.format(
+        filename, export_format
+    )
+    return response
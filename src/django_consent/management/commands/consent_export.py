@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import exports
+from ... import models
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the valid consent of a source or campaign as CSV or JSON lines, "
+        "streaming rows from the database"
+    )
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--source", type=int, help="ID of a consent source")
+        group.add_argument("--campaign", type=int, help="ID of an email campaign")
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--output", help="File to write, default is stdout")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options["source"]:
+            model, object_id = models.ConsentSource, options["source"]
+        else:
+            model, object_id = models.EmailCampaign, options["campaign"]
+        try:
+            obj = model.objects.get(id=object_id)
+        except model.DoesNotExist:
+            raise CommandError("{} does not exist".format(model._meta.verbose_name))
+
+        recipients = obj.iter_recipients(chunk_size=options["chunk_size"])
+        lines = exports.iter_export(recipients, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="") as f:
+                f.writelines(lines)
+        else:
+            # Not self.stdout, which would add a line ending to each line
+            sys.stdout.writelines(lines)
@@ -0,0 +1,73 @@
+import itertools
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import models
+from ... import utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a file with one email per line as consent for a consent source. "
+        "Pass a checkpoint file to be able to resume an interrupted import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source_id", type=int)
+        parser.add_argument("path", help="File with one email per line")
+        parser.add_argument(
+            "--require-confirmation",
+            action="store_true",
+            help="Consent for new and inactive users has to be confirmed",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--checkpoint",
+            help="File storing the number of lines imported so far. If it "
+            "exists, the import continues after that line.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            source = models.ConsentSource.objects.get(id=options["source_id"])
+        except models.ConsentSource.DoesNotExist:
+            raise CommandError("Consent source does not exist")
+
+        checkpoint = options["checkpoint"]
+        offset = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                offset = int(f.read().strip() or 0)
+            self.stdout.write("Resuming after line {}".format(offset))
+
+        created = 0
+        lines_read = 0
+        started = time.monotonic()
+        with open(options["path"]) as f:
+            lines = itertools.islice(f, offset, None)
+            for chunk in utils.chunked(lines, options["batch_size"]):
+                emails = [line.strip() for line in chunk if line.strip()]
+                created += models.UserConsent.bulk_capture_email_consent(
+                    source,
+                    emails,
+                    require_confirmation=options["require_confirmation"],
+                    batch_size=options["batch_size"],
+                )
+                offset += len(chunk)
+                lines_read += len(chunk)
+                if checkpoint:
+                    with open(checkpoint, "w") as checkpoint_file:
+                        checkpoint_file.write(str(offset))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    "{} lines read, {} consents created ({:.0f} lines/s)".format(
+                        offset, created, lines_read / elapsed if elapsed else 0
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS("Done: {} consents created".format(created))
+        )
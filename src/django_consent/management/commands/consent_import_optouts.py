@@ -0,0 +1,113 @@
+import collections
+import concurrent.futures
+import csv
+import itertools
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import models
+from ... import utils
+
+
+def hash_chunks(chunks, processes):
+    """
+    Yields each chunk of emails with their hashes, in order. With several
+    processes, only a few chunks are hashed ahead so memory stays constant.
+    """
+    if processes < 2:
+        for chunk in chunks:
+            yield chunk, utils.get_email_hashes(chunk)
+        return
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(utils.get_email_hashes, chunk)))
+            if len(pending) > processes * 2:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a suppression list of emails that must never be emailed, for "
+        "instance from another email service, as opt-outs of everything. Only "
+        "the hashes of the emails are stored. Pass a checkpoint file to be able "
+        "to resume an interrupted import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="File with one email per line, or a CSV file with --column"
+        )
+        parser.add_argument(
+            "--column",
+            help="Read a CSV file and take emails from this column, given by its "
+            "header or its number counting from 0",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of processes normalizing and hashing emails",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="File storing the number of rows imported so far. If it "
+            "exists, the import continues after that row.",
+        )
+
+    def read_emails(self, f, column):
+        if column is None:
+            return f
+        reader = csv.reader(f)
+        if column.isdigit():
+            index = int(column)
+        else:
+            try:
+                index = next(reader).index(column)
+            except (StopIteration, ValueError):
+                raise CommandError("Column {} not found".format(column))
+        return (row[index] if len(row) > index else "" for row in reader)
+
+    def handle(self, *args, **options):
+        checkpoint = options["checkpoint"]
+        offset = 0
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                offset = int(f.read().strip() or 0)
+            self.stdout.write("Resuming after row {}".format(offset))
+
+        created = 0
+        rows_read = 0
+        started = time.monotonic()
+        with open(options["path"], newline="") as f:
+            emails = itertools.islice(
+                self.read_emails(f, options["column"]), offset, None
+            )
+            chunks = utils.chunked(emails, options["batch_size"])
+            for chunk, email_hashes in hash_chunks(chunks, options["processes"]):
+                created += models.EmailOptOut.bulk_optout_email_hashes(
+                    email_hashes, batch_size=options["batch_size"]
+                )
+                offset += len(chunk)
+                rows_read += len(chunk)
+                if checkpoint:
+                    with open(checkpoint, "w") as checkpoint_file:
+                        checkpoint_file.write(str(offset))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    "{} rows read, {} opt-outs created ({:.0f} rows/s)".format(
+                        offset, created, rows_read / elapsed if elapsed else 0
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS("Done: {} opt-outs created".format(created))
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ... import sending
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends queued emails when settings.CONSENT_EMAIL_OUTBOX is enabled. "
+        "Several workers can run at the same time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait when there is nothing to send",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there is nothing left to send",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = sending.send_outbox(batch_size=options["batch_size"])
+            if sent or failed:
+                self.stdout.write("{} sent, {} failed".format(sent, failed))
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["sleep"])
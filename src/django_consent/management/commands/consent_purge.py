@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from ... import purging
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes consent that was never confirmed, and the inactive users that "
+        "were only created for it. Opt-outs are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--age",
+            type=int,
+            help="Seconds since the consent was created and last asked to "
+            "confirm, defaults to settings.CONSENT_PURGE_UNCONFIRMED_AFTER",
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to wait between chunks",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the consent that would be deleted",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            count = purging.get_stale_consent(options["age"]).count()
+            self.stdout.write("{} consents would be deleted".format(count))
+            return
+
+        def progress(consents, users):
+            self.stdout.write(
+                "{} consents and {} users deleted".format(consents, users)
+            )
+
+        consents, users = purging.purge_unconfirmed(
+            age=options["age"],
+            chunk_size=options["chunk_size"],
+            sleep=options["sleep"],
+            progress=progress,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Done: {} consents and {} users deleted".format(consents, users)
+            )
+        )
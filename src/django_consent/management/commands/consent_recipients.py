@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import models
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds or verifies the table of recipients maintained when "
+        "settings.CONSENT_MATERIALIZE_RECIPIENTS is enabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Recreate all recipients"
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Fail if any recipient differs from the consent it reflects",
+        )
+
+    def handle(self, *args, **options):
+        if not options["rebuild"] and not options["verify"]:
+            raise CommandError("Specify --rebuild and/or --verify")
+
+        if options["rebuild"]:
+            models.ConsentRecipient.objects.rebuild()
+            self.stdout.write(
+                "Rebuilt {} recipients".format(models.ConsentRecipient.objects.count())
+            )
+
+        if options["verify"]:
+            mismatches = models.ConsentRecipient.objects.verify()
+            if mismatches:
+                raise CommandError(
+                    "{} recipients are out of date, for instance consent IDs {}. "
+                    "Run with --rebuild to fix them.".format(
+                        len(mismatches), ", ".join(str(i) for i in mismatches[:10])
+                    )
+                )
+            self.stdout.write(self.style.SUCCESS("All recipients are up to date"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ... import seeding
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates the consent sources of settings.CONSENT_SEED. This also "
+        "happens after running migrate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Overwrite sources and translations that differ from the seed",
+        )
+
+    def handle(self, *args, **options):
+        created, updated = seeding.seed(update=options["update"])
+        self.stdout.write(
+            self.style.SUCCESS("{} created, {} updated".format(created, updated))
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils.module_loading import import_string
+
+from ... import models
+from ... import sending
+
+
+class Command(BaseCommand):
+    help = "Sends an email to everyone with valid consent for a campaign"
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign_id", type=int)
+        parser.add_argument(
+            "email_class",
+            help="Dotted path to a subclass of django_consent.emails.BaseEmail",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            campaign = models.EmailCampaign.objects.get(id=options["campaign_id"])
+        except models.EmailCampaign.DoesNotExist:
+            raise CommandError("Campaign does not exist")
+        try:
+            email_class = import_string(options["email_class"])
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        def progress(sent, elapsed):
+            self.stdout.write(
+                "{} sent ({:.0f} messages/s)".format(
+                    sent, sent / elapsed if elapsed else 0
+                )
+            )
+
+        sent = sending.send_campaign(
+            campaign,
+            email_class,
+            batch_size=options["batch_size"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS("Done: {} sent".format(sent)))
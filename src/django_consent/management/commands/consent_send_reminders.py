@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import sending
+from ... import throttling
+
+
+class Command(BaseCommand):
+    help = "Reminds everyone whose confirmation of their email is overdue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--rate",
+            help='The most emails to send, like "10/s" or "1000/h"',
+        )
+        parser.add_argument(
+            "--delay",
+            type=int,
+            help="Seconds since the last request to confirm, defaults to "
+            "settings.CONSENT_CONFIRMATION_REMINDER_DELAY",
+        )
+        parser.add_argument(
+            "--max-reminders",
+            type=int,
+            help="Defaults to settings.CONSENT_CONFIRMATION_REMINDER_MAX",
+        )
+
+    def handle(self, *args, **options):
+        if options["rate"]:
+            try:
+                throttling.parse_rate(options["rate"])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        def progress(sent, elapsed):
+            self.stdout.write(
+                "{} sent ({:.0f} messages/s)".format(
+                    sent, sent / elapsed if elapsed else 0
+                )
+            )
+
+        sent = sending.send_confirmation_reminders(
+            batch_size=options["batch_size"],
+            rate=options["rate"],
+            delay=options["delay"],
+            max_reminders=options["max_reminders"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS("Done: {} reminders sent".format(sent)))
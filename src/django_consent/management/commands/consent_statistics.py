@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from ... import models
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the statistics counted when settings.CONSENT_STATISTICS is "
+        "enabled, or shows the totals of a source."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recount all statistics from consent and opt-outs",
+        )
+        parser.add_argument("--source", type=int, help="Show totals of a source")
+
+    def handle(self, *args, **options):
+        if not options["rebuild"] and not options["source"]:
+            raise CommandError("Specify --rebuild and/or --source")
+
+        if options["rebuild"]:
+            buckets = models.ConsentStatistics.objects.rebuild()
+            self.stdout.write("Rebuilt {} buckets".format(buckets))
+
+        if options["source"]:
+            totals = models.ConsentStatistics.objects.totals(source=options["source"])
+            for name, total in totals.items():
+                self.stdout.write("{}: {}".format(name, total))
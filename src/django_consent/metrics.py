@@ -0,0 +1,229 @@
+"""
+Counters and timings of consent operations and email delivery, configured with
+``settings.CONSENT_METRICS``::
+
+    CONSENT_METRICS = {
+        "sink": "django_consent.metrics.StatsdSink",
+        "host": "localhost",
+        "port": 8125,
+        "prefix": "consent",
+    }
+
+The operations are wrapped by :func:`instrument` when the app is loaded, so
+calling code doesn't change. Sending is measured for emails sent through
+:class:`~django_consent.backends.ConsentEmailBackend`. Without a sink, the wrappers only check that
+metrics are disabled.
+
+With :class:`PrometheusSink`, add :func:`prometheus_view` to your urlconf and
+protect it like other internal URLs::
+
+    path("metrics/", django_consent.metrics.prometheus_view),
+"""
+import bisect
+import functools
+import socket
+import threading
+import time
+
+from django.http import Http404
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from . import settings as consent_settings
+
+
+class NullSink:
+    """
+    Discards everything, the default
+    """
+
+    enabled = False
+
+    def __init__(self, **options):
+        pass
+
+    def increment(self, name, value=1):
+        pass
+
+    def timing(self, name, seconds):
+        pass
+
+
+class StatsdSink:
+    """
+    Sends counters and timings to a StatsD server over UDP
+    """
+
+    enabled = True
+
+    def __init__(self, host="localhost", port=8125, prefix="consent", **options):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, line):
+        try:
+            self.socket.sendto("{}.{}".format(self.prefix, line).encode(), self.address)
+        except OSError:
+            # Metrics must never break the operation they measure
+            pass
+
+    def increment(self, name, value=1):
+        self._send("{}:{}|c".format(name, value))
+
+    def timing(self, name, seconds):
+        self._send("{}:{:.3f}|ms".format(name, seconds * 1000))
+
+
+class PrometheusSink:
+    """
+    Keeps counters and histograms in the memory of the current process, shown
+    in Prometheus' text format by :func:`prometheus_view`
+    """
+
+    enabled = True
+
+    #: Upper bounds of the histogram buckets in seconds
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+    def __init__(self, prefix="consent", buckets=DEFAULT_BUCKETS, **options):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.counters = {}
+        # Name: [count per bucket..., sum]
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timing(self, name, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = [0] * (len(self.buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def render(self):
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {name: list(h) for name, h in self.histograms.items()}
+        lines = []
+        for name, value in sorted(counters.items()):
+            metric = "{}_{}_total".format(self.prefix, name)
+            lines += ["# TYPE {} counter".format(metric), "{} {}".format(metric, value)]
+        for name, histogram in sorted(histograms.items()):
+            metric = "{}_{}_seconds".format(self.prefix, name)
+            lines.append("# TYPE {} histogram".format(metric))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram):
+                cumulative += count
+                lines.append(
+                    '{}_bucket{{le="{}"}} {}'.format(metric, bound, cumulative)
+                )
+            lines.append("{}_sum {}".format(metric, histogram[-1]))
+            lines.append("{}_count {}".format(metric, cumulative))
+        return "\n".join(lines) + "\n"
+
+
+_sink = None
+
+
+def get_sink():
+    """
+    Returns the sink of the current process
+    """
+    global _sink
+    if _sink is None:
+        options = dict(consent_settings.METRICS or {})
+        sink_class = import_string(
+            options.pop("sink", "django_consent.metrics.NullSink")
+        )
+        _sink = sink_class(**options)
+    return _sink
+
+
+def timed(name, func):
+    """
+    Wraps ``func`` to count calls and errors and time them as ``name``
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        sink = _sink or get_sink()
+        if not sink.enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            sink.increment(name + "_errors")
+            raise
+        sink.timing(name, time.perf_counter() - started)
+        sink.increment(name)
+        return result
+
+    wrapper.__wrapped_by_metrics__ = True
+    return wrapper
+
+
+def _wrap(owner, attribute, name):
+    value = owner.__dict__[attribute]
+    if isinstance(value, classmethod):
+        func = value.__func__
+        if not getattr(func, "__wrapped_by_metrics__", False):
+            setattr(owner, attribute, classmethod(timed(name, func)))
+    elif not getattr(value, "__wrapped_by_metrics__", False):
+        setattr(owner, attribute, timed(name, value))
+
+
+def _count_invalid_tokens(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if result is None and (_sink or get_sink()).enabled:
+            _sink.increment("token_validation_invalid")
+        return result
+
+    wrapper.__wrapped_by_metrics__ = True
+    return wrapper
+
+
+def instrument():
+    """
+    Wraps the operations which are measured. Called when the app is loaded,
+    and safe to call again.
+    """
+    from . import backends
+    from . import emails
+    from . import models
+    from . import utils
+    from . import views
+
+    _wrap(models.UserConsent, "capture_email_consent", "capture_email_consent")
+    _wrap(models.UserConsent, "email_confirmation", "email_confirmation")
+    _wrap(models.UserConsent, "optout", "optout")
+    _wrap(views.ConsentOptOutMixin, "action", "optout")
+    _wrap(emails.BaseEmail, "get_body", "email_render")
+    _wrap(emails.BaseEmail, "get_subject", "email_render_subject")
+    _wrap(backends.ConsentEmailBackend, "send_messages", "email_send")
+    if not getattr(utils.get_token_email_hash, "__wrapped_by_metrics__", False):
+        # validate_token() and the views look it up in the module when called
+        utils.get_token_email_hash = timed(
+            "token_validation", _count_invalid_tokens(utils.get_token_email_hash)
+        )
+
+
+def prometheus_view(request):
+    """
+    Shows the metrics of this process if ``PrometheusSink`` is used
+    """
+    sink = get_sink()
+    if not isinstance(sink, PrometheusSink):
+        raise Http404("Metrics are not collected for Prometheus")
+    return HttpResponse(
+        sink.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:16
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("django_consent", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsentRecipient",
+            fields=[
+                (
+                    "consent",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="recipient",
+                        serialize=False,
+                        to="django_consent.userconsent",
+                    ),
+                ),
+                ("email_hash", models.UUIDField()),
+                ("is_sendable", models.BooleanField(default=False)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipients",
+                        to="django_consent.consentsource",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="consentrecipient",
+            index=models.Index(
+                fields=["source", "is_sendable"], name="django_cons_source__09edc1_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:18
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_consent", "0002_consentrecipient"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="emailoptout",
+            index=models.Index(fields=["email_hash"], name="optout_email_hash_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="emailoptout",
+            index=models.Index(
+                fields=["user", "is_everything"], name="optout_user_everything_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userconsent",
+            index=models.Index(
+                fields=["source", "email_confirmed"],
+                name="consent_source_confirmed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userconsent",
+            index=models.Index(fields=["email_hash"], name="consent_email_hash_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="userconsent",
+            index=models.Index(
+                condition=models.Q(("email_confirmed", False)),
+                fields=["email_confirmation_requested"],
+                name="consent_unconfirmed_idx",
+            ),
+        ),
+    ]
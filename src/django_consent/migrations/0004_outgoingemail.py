@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:24
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_consent", "0003_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutgoingEmail",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "email_type",
+                    models.CharField(
+                        choices=[("confirmation", "confirmation")], max_length=32
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("send_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("sent", models.DateTimeField(blank=True, null=True)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True)),
+                ("claim_token", models.UUIDField(editable=False, null=True)),
+                ("claimed_until", models.DateTimeField(editable=False, null=True)),
+                (
+                    "consent",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outgoing_emails",
+                        to="django_consent.userconsent",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="outgoingemail",
+            index=models.Index(
+                condition=models.Q(("sent__isnull", True)),
+                fields=["send_after"],
+                name="outgoing_email_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="outgoingemail",
+            index=models.Index(fields=["claim_token"], name="outgoing_email_claim_idx"),
+        ),
+    ]
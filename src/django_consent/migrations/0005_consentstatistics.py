@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:38
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_consent", "0004_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConsentStatistics",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.DateTimeField(help_text="Start of the hour or day counted"),
+                ),
+                ("signups", models.PositiveIntegerField(default=0)),
+                ("confirmations", models.PositiveIntegerField(default=0)),
+                ("optouts", models.PositiveIntegerField(default=0)),
+                ("optouts_undone", models.PositiveIntegerField(default=0)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="statistics",
+                        to="django_consent.consentsource",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "consent statistics",
+                "unique_together": {("source", "bucket")},
+            },
+        ),
+    ]
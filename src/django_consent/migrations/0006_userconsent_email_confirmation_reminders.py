@@ -0,0 +1,20 @@
+# Generated by Django 3.2.25 on 2026-10-18 03:50
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_consent", "0005_consentstatistics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userconsent",
+            name="email_confirmation_reminders",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of reminders sent to confirm the email"
+            ),
+        ),
+    ]
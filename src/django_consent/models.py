@@ -1,18 +1,251 @@
+import uuid
+from datetime import timedelta
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.management.utils import get_random_secret_key
+from django.db import connections
+from django.db import IntegrityError
 from django.db import models
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import Exists
 from django.db.models import F
+from django.db.models import Min
+from django.db.models import OuterRef
 from django.db.models import Q
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import TruncDay
+from django.db.models.functions import TruncHour
 from django.utils import timezone
 from django.utils import translation
 from django.utils.translation import gettext_lazy as _
 
+from . import cache
 from . import emails
 from . import settings as consent_settings
 from . import utils
 
+#: Translations of consent sources by (source id, language)
+translation_cache = cache.TieredCache(
+    "consent-translation",
+    max_size=consent_settings.TRANSLATION_CACHE_SIZE,
+    timeout=consent_settings.TRANSLATION_CACHE_TIMEOUT,
+    backend=consent_settings.TRANSLATION_CACHE_BACKEND,
+)
+
+#: Consent sources by ``auto_create_id``, see :meth:`ConsentSource.get_by_key`.
+#: Sources are edited as rarely as translations, so they expire as often.
+source_cache = cache.LocalCache(
+    max_size=consent_settings.TRANSLATION_CACHE_SIZE,
+    timeout=consent_settings.TRANSLATION_CACHE_TIMEOUT,
+)
+
+
+class UserConsentQuerySet(models.QuerySet):
+    def _optout_exists(self):
+        optouts = EmailOptOut.objects.filter(
+            Q(user=OuterRef("user")) | Q(email_hash=OuterRef("email_hash")),
+            consent=OuterRef("pk"),
+        )
+        everything_optouts = EmailOptOut.objects.filter(
+            user=OuterRef("user"), is_everything=True
+        )
+        # Opt-outs remain after users are deleted, and the same email may be
+        # imported again
+        email_optouts = EmailOptOut.objects.filter(
+            email_hash=OuterRef("email_hash"), is_everything=True
+        )
+        return [Exists(optouts), Exists(everything_optouts), Exists(email_optouts)]
+
+    def _opted_out_q(self):
+        opted_out = Q()
+        for exists in self._optout_exists():
+            opted_out |= Q(exists)
+        return opted_out
+
+    def _validity_q(self):
+        return Q(
+            *[~exists for exists in self._optout_exists()],
+            Q(source__requires_confirmed_email=False) | Q(email_confirmed=True),
+            Q(source__requires_active_user=False) | Q(user__is_active=True),
+        )
+
+    def with_validity(self):
+        """
+        Annotates each consent with ``valid``, telling whether it has not been
+        opted out of and fulfills the requirements of its source.
+        """
+        return self.annotate(
+            valid=Case(
+                When(self._validity_q(), then=True),
+                default=False,
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def valid(self):
+        """
+        Only keeps the consent that has not been opted out of and fulfills the
+        requirements of its source. Opt-outs are checked with ``EXISTS``
+        subqueries, so rows are not duplicated and there's no need for
+        ``.distinct()``.
+        """
+        return self.filter(self._validity_q())
+
+    def confirmation_overdue(self, requested_before, max_reminders):
+        """
+        Only keeps unconfirmed consent to sources requiring a confirmed email,
+        which was last asked to confirm before ``requested_before`` and got
+        fewer than ``max_reminders`` reminders. Consent that was opted out of
+        is left out. The range is read from the partial index
+        ``consent_unconfirmed_idx``.
+        """
+        return self.filter(
+            *[~exists for exists in self._optout_exists()],
+            email_confirmed=False,
+            email_confirmation_requested__lt=requested_before,
+            email_confirmation_reminders__lt=max_reminders,
+            source__requires_confirmed_email=True,
+            user__isnull=False,
+        )
+
+    def _count_by_source_id(self):
+        return dict(self.order_by().values_list("source").annotate(Count("pk")))
+
+    def count_by_source(self):
+        """
+        Returns a dict with the number of consents, valid consents and consents
+        that were opted out of for each source ID, counted in one query.
+        """
+        counts = (
+            self.order_by()
+            .values("source")
+            .annotate(
+                total=Count("pk"),
+                valid=Count("pk", filter=self._validity_q()),
+                opted_out=Count("pk", filter=self._opted_out_q()),
+            )
+        )
+        return {row.pop("source"): row for row in counts}
+
+    def confirm(self):
+        """
+        Confirms unconfirmed consent in one ``UPDATE``, like
+        :meth:`UserConsent.confirm`
+
+        :returns: The number of consents updated
+        """
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            updated = self.filter(email_confirmed=False).update(
+                email_confirmed=True, modified=now
+            )
+            if consent_settings.STATISTICS and updated:
+                # Counts the rows that were changed, which are the ones
+                # modified at exactly this time
+                changed = UserConsent.objects.using(self.db).filter(
+                    email_confirmed=True, modified=now
+                )
+                ConsentStatistics.objects.db_manager(self.db).increment_many(
+                    changed._count_by_source_id(), "confirmations"
+                )
+        # update() doesn't send post_save
+        if consent_settings.MATERIALIZE_RECIPIENTS:
+            ConsentRecipient.objects.refresh(self)
+        return updated
+
+    def optout(self):
+        """
+        Opts out of all consent with one ``INSERT ... SELECT``, like
+        :meth:`UserConsent.optout`. Consent which was already opted out of is
+        skipped.
+
+        :returns: The number of opt-outs created
+        """
+        now = timezone.now()
+        consents = self.order_by().filter(
+            ~Exists(
+                # Not by user, which is NULL if the user was deleted
+                EmailOptOut.objects.filter(consent=OuterRef("pk"), is_everything=False)
+            )
+        )
+        select = consents.annotate(
+            optout_is_everything=Value(False, output_field=models.BooleanField()),
+            optout_created=Value(now, output_field=models.DateTimeField()),
+            optout_modified=Value(now, output_field=models.DateTimeField()),
+        ).values(
+            "user_id",
+            "pk",
+            "email_hash",
+            "optout_is_everything",
+            "optout_created",
+            "optout_modified",
+        )
+        compiler = select.query.get_compiler(self.db)
+        select_sql, params = compiler.as_sql()
+        # The INSERT relies on fields being selected before annotations
+        selected = [
+            expression.target.attname if hasattr(expression, "target") else alias
+            for expression, __, alias in compiler.select
+        ]
+        if selected != [
+            "user_id",
+            "id",
+            "email_hash",
+            "optout_is_everything",
+            "optout_created",
+            "optout_modified",
+        ]:
+            raise RuntimeError(
+                "Unexpected columns selected for opt-outs: {}".format(selected)
+            )
+        connection = connections[self.db]
+        optout_meta = EmailOptOut._meta
+        columns = [
+            optout_meta.get_field(name).column
+            for name in [
+                "user",
+                "consent",
+                "email_hash",
+                "is_everything",
+                "created",
+                "modified",
+            ]
+        ]
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {} ({}) {}".format(
+                    connection.ops.quote_name(optout_meta.db_table),
+                    ", ".join(connection.ops.quote_name(c) for c in columns),
+                    select_sql,
+                ),
+                params,
+            )
+            created = cursor.rowcount
+            if consent_settings.STATISTICS and created:
+                # Counts the opt-outs that were inserted, which are the ones
+                # created at exactly this time
+                inserted = EmailOptOut.objects.using(self.db).filter(
+                    created=now, is_everything=False
+                )
+                ConsentStatistics.objects.db_manager(self.db).increment_many(
+                    dict(
+                        inserted.order_by()
+                        .values_list("consent__source")
+                        .annotate(Count("pk"))
+                    ),
+                    "optouts",
+                )
+        # No post_save is sent for the inserted rows
+        if consent_settings.MATERIALIZE_RECIPIENTS:
+            ConsentRecipient.objects.refresh(self)
+        return created
+
 
 class ConsentSource(models.Model):
     """
@@ -50,47 +283,133 @@ class ConsentSource(models.Model):
         ),
     )
 
+    #: Fields deciding whether consent to the source is valid
+    REQUIREMENT_FIELDS = ["requires_confirmed_email", "requires_active_user"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_requirements()
+        return instance
+
+    def _get_requirements(self):
+        # Deferred fields aren't loaded
+        return {f: self.__dict__.get(f) for f in self.REQUIREMENT_FIELDS}
+
+    def remember_requirements(self):
+        self._saved_requirements = self._get_requirements()
+
+    def requirements_changed(self):
+        """
+        Whether the requirements differ from when the source was loaded or
+        last saved. Sources that weren't loaded from the database may have
+        changed.
+        """
+        saved = getattr(self, "_saved_requirements", None)
+        return saved is None or saved != self._get_requirements()
+
     def get_valid_consent(self):
         """
         Returns all current consent (that have not opted out)
+
+        If ``settings.CONSENT_MATERIALIZE_RECIPIENTS`` is enabled, this is read
+        from the :class:`ConsentRecipient` table.
         """
-        return (
-            UserConsent.objects.filter(source=self)
-            .exclude(user__email_optouts__is_everything=True)
-            .exclude(optouts__user=F("user"))
-            .exclude(optouts__email_hash=F("email_hash"))
-            .filter(
-                Q(source__requires_confirmed_email=False) | Q(email_confirmed=True),
-                Q(source__requires_active_user=False) | Q(user__is_active=True),
+        if consent_settings.MATERIALIZE_RECIPIENTS:
+            return UserConsent.objects.filter(
+                recipient__source=self, recipient__is_sendable=True
             )
-        ).distinct()
+        return UserConsent.objects.filter(source=self).valid()
+
+    def iter_recipients(self, chunk_size=2000):
+        """
+        Yields a :class:`~django_consent.utils.Recipient` for each valid consent
+        without creating model instances. Use this rather than iterating
+        :meth:`get_valid_consent` when sending to large lists.
+        """
+        return utils.iter_recipients(self.get_valid_consent(), chunk_size=chunk_size)
 
     def __str__(self):
         return self.source_name
 
+    @classmethod
+    def get_by_key(cls, auto_create_id):
+        """
+        Returns the source created from ``settings.CONSENT_SEED`` with this key,
+        cached in the current process. The returned instance is shared, so
+        don't modify it.
+
+        Raises ``ConsentSource.DoesNotExist`` if it hasn't been seeded.
+        """
+        source = source_cache.get(auto_create_id)
+        if source is cache.MISSING:
+            source = cls.objects.get(auto_create_id=auto_create_id)
+            source_cache.set(auto_create_id, source)
+        return source
+
+    @staticmethod
+    def invalidate_cache(auto_create_id):
+        """
+        Removes a source from the cache of :meth:`get_by_key`
+        """
+        source_cache.delete_many([auto_create_id])
+
+    def get_translation(self, language=None):
+        """
+        Returns a ``(source_name, definition)`` tuple translated to the active
+        language, or ``None`` if there is no translation.
+
+        Translations are cached, see :func:`prefetch_translations` for looking
+        up many sources at once.
+        """
+        language = language or translation.get_language()
+        key = (self.pk, language)
+        value = translation_cache.get(key)
+        if value is cache.MISSING:
+            value = (
+                self.translations.filter(language_code=language)
+                .values_list("source_name", "definition")
+                .first()
+            )
+            translation_cache.set(key, value)
+        return value
+
+    @classmethod
+    def prefetch_translations(cls, sources, language=None):
+        """
+        Caches the translations of many sources with one query, for instance
+        before listing them in a template.
+        """
+        language = language or translation.get_language()
+        missing = [
+            source.pk
+            for source in sources
+            if translation_cache.get((source.pk, language)) is cache.MISSING
+        ]
+        if not missing:
+            return
+        translations = ConsentSourceTranslation.objects.filter(
+            consent_source_id__in=missing, language_code=language
+        ).values_list("consent_source_id", "source_name", "definition")
+        found = {row[0]: row[1:] for row in translations}
+        for source_id in missing:
+            translation_cache.set((source_id, language), found.get(source_id))
+
     @property
     def definition_translated(self):
         if settings.USE_I18N:
-            try:
-                return self.translations.get(
-                    language_code=translation.get_language()
-                ).definition
-            except ConsentSourceTranslation.DoesNotExist:
-                return self.definition
-        else:
-            return self.definition
+            translated = self.get_translation()
+            if translated:
+                return translated[1]
+        return self.definition
 
     @property
     def source_name_translated(self):
         if settings.USE_I18N:
-            try:
-                return self.translations.get(
-                    language_code=translation.get_language()
-                ).source_name
-            except ConsentSourceTranslation.DoesNotExist:
-                return self.source_name
-        else:
-            return self.source_name
+            translated = self.get_translation()
+            if translated:
+                return translated[0]
+        return self.source_name
 
 
 class ConsentSourceTranslation(models.Model):
@@ -119,6 +438,18 @@ class ConsentSourceTranslation(models.Model):
     def __str__(self):
         return "{} ({})".format(self.consent_source.source_name, self.language_code)
 
+    @staticmethod
+    def invalidate_cache(source_id, language_code=None):
+        """
+        Removes cached translations of a source
+        """
+        translation_cache.local.delete_matching(lambda key: key[0] == source_id)
+        languages = {code for code, __ in settings.LANGUAGES}
+        languages |= {settings.LANGUAGE_CODE, language_code}
+        translation_cache.delete_many(
+            [(source_id, language) for language in languages if language]
+        )
+
 
 class UserConsent(models.Model):
     """
@@ -141,14 +472,42 @@ class UserConsent(models.Model):
     modified = models.DateTimeField(auto_now=True)
 
     email_confirmation_requested = models.DateTimeField(null=True, blank=True)
+    email_confirmation_reminders = models.PositiveIntegerField(
+        default=0, help_text=_("Number of reminders sent to confirm the email")
+    )
     email_confirmed = models.BooleanField(default=False)
     email_hash = models.UUIDField()
 
+    objects = UserConsentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "email_confirmed"],
+                name="consent_source_confirmed_idx",
+            ),
+            models.Index(fields=["email_hash"], name="consent_email_hash_idx"),
+            # Finds consent still waiting for confirmation
+            models.Index(
+                fields=["email_confirmation_requested"],
+                condition=Q(email_confirmed=False),
+                name="consent_unconfirmed_idx",
+            ),
+        ]
+
     def email_confirmation(self, request=None):
         """
         Sends a confirmation email if necessary
+
+        If ``settings.CONSENT_EMAIL_OUTBOX`` is enabled, the email is queued in
+        :class:`OutgoingEmail` instead, and sent by ``manage.py
+        consent_outbox_worker``.
         """
-        if not self.email_confirmed:
+        if not self.email_confirmed and consent_settings.EMAIL_OUTBOX:
+            OutgoingEmail.objects.create(
+                consent=self, email_type=OutgoingEmail.CONFIRMATION
+            )
+        elif not self.email_confirmed:
             email = emails.ConfirmationNeededEmail(
                 request=request, user=self.user, consent=self
             )
@@ -201,23 +560,147 @@ class UserConsent(models.Model):
             user.save()
             if require_confirmation:
                 consent_create_kwargs["email_confirmation_requested"] = timezone.now()
-        return cls.objects.create(source=source, user=user, **consent_create_kwargs)
+        consent = cls.objects.create(source=source, user=user, **consent_create_kwargs)
+        ConsentStatistics.objects.increment(
+            source.id, signups=1, confirmations=int(consent.email_confirmed)
+        )
+        return consent
+
+    @classmethod
+    def bulk_capture_email_consent(
+        cls, source, emails, require_confirmation=False, batch_size=1000, progress=None
+    ):
+        """
+        Stores consent for many emails at once, for instance when importing a
+        mailing list. The outcome for each email is the same as calling
+        :meth:`capture_email_consent`, but users are looked up in chunks and
+        missing users and consents are created with ``bulk_create``.
+
+        Emails that already have consent for the source are skipped, so an
+        interrupted import can safely be run again.
+
+        :param: progress: Optional callable which is invoked after each chunk
+        with the number of emails processed and consents created so far.
+
+        :returns: The number of consents created
+        """
+        processed = 0
+        created = 0
+        for chunk in utils.chunked(emails, batch_size):
+            with transaction.atomic():
+                created += cls._bulk_capture_chunk(source, chunk, require_confirmation)
+            processed += len(chunk)
+            if progress:
+                progress(processed, created)
+        return created
+
+    @staticmethod
+    def _get_placeholder_user(email):
+        """
+        Returns an unsaved inactive user with an unusable password, standing in
+        for an email that we do not have a user for yet.
+        """
+        User = get_user_model()
+        create_kwargs = {
+            User.EMAIL_FIELD: email,
+            "is_active": False,
+        }
+        if User.EMAIL_FIELD != User.USERNAME_FIELD:
+            create_kwargs[User.USERNAME_FIELD] = get_random_secret_key()
+        for field_name in [f for f in User.REQUIRED_FIELDS if f not in create_kwargs]:
+            # Custom auth models have to implement this method if they want
+            # to create rows with just an email on-the-fly
+            create_kwargs[field_name] = User.get_consent_empty_value(field_name)
+        user = User(**create_kwargs)
+        user.set_unusable_password()
+        return user
+
+    @classmethod
+    def _bulk_capture_chunk(cls, source, emails, require_confirmation):
+        User = get_user_model()
+        email_field = User.EMAIL_FIELD
+        # Remove duplicates but keep the order of the import
+        emails = list(dict.fromkeys(emails))
+
+        def get_users(emails):
+            return {
+                getattr(user, email_field): user
+                for user in User.objects.filter(**{email_field + "__in": emails}).only(
+                    "pk", email_field, "is_active"
+                )
+            }
+
+        users = get_users(emails)
+
+        new_users = [
+            cls._get_placeholder_user(email) for email in emails if email not in users
+        ]
+        new_emails = set()
+        if new_users:
+            User.objects.bulk_create(new_users)
+            new_emails = {getattr(user, email_field) for user in new_users}
+            # Not all database backends return primary keys from bulk_create
+            users.update(get_users(list(new_emails)))
+
+        already_consented = set(
+            cls.objects.filter(
+                source=source, user_id__in=[user.pk for user in users.values()]
+            ).values_list("user_id", flat=True)
+        )
+
+        now = timezone.now()
+        consents = []
+        for email in emails:
+            user = users[email]
+            if user.pk in already_consented:
+                continue
+            consent = cls(
+                source=source,
+                user=user,
+                email_hash=utils.get_email_hash(email),
+                email_confirmed=not require_confirmation,
+            )
+            if email in new_emails:
+                if require_confirmation:
+                    consent.email_confirmation_requested = now
+            elif not user.is_active and require_confirmation:
+                consent.email_confirmation_requested = now
+            else:
+                consent.email_confirmed = True
+            consents.append(consent)
+
+        cls.objects.bulk_create(consents)
+        ConsentStatistics.objects.increment(
+            source.id,
+            signups=len(consents),
+            confirmations=sum(consent.email_confirmed for consent in consents),
+        )
+        if consents and consent_settings.MATERIALIZE_RECIPIENTS:
+            ConsentRecipient.objects.refresh(
+                cls.objects.filter(source=source, user__in=[c.user for c in consents])
+            )
+        return len(consents)
 
     def optout(self, is_everything=False):
         """
         Ensures that user is opted out of this consent.
         """
-        return EmailOptOut.objects.get_or_create(
+        optout, created = EmailOptOut.objects.get_or_create(
             user=self.user,
             consent=self,
             is_everything=is_everything,
-        )[0]
+        )
+        if created:
+            ConsentStatistics.objects.increment(self.source_id, optouts=1)
+        return optout
 
     def confirm(self):
         """
         Marks a consent as confirmed. This will not delete any potential optouts
         already existing.
         """
+        if not self.email_confirmed:
+            ConsentStatistics.objects.increment(self.source_id, confirmations=1)
         self.email_confirmed = True
         self.save()
 
@@ -229,6 +712,7 @@ class UserConsent(models.Model):
     def is_valid(self):
         """
         Try to avoid using this - instead, do lookups directly of what you need.
+        For many consents, use ``UserConsent.objects.with_validity()``.
         """
         return self.email_confirmed and not (
             self.optouts.all().exists()
@@ -237,7 +721,8 @@ class UserConsent(models.Model):
 
     @property
     def email(self):
-        return self.user.email
+        # The user may have been deleted, leaving links in sent emails
+        return self.user.email if self.user else None
 
     @property
     def confirm_token(self):
@@ -261,6 +746,43 @@ class EmailCampaign(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
 
+    def get_recipients(self, segment=None):
+        """
+        Returns the valid consent to email for this campaign, one per email
+        address, as a single query.
+
+        :param: segment: Optionally narrows down the recipients, see
+        :mod:`django_consent.segments`. The returned consent is always from one
+        of the campaign's consent sources.
+        """
+        if consent_settings.MATERIALIZE_RECIPIENTS:
+            valid_consent = UserConsent.objects.filter(recipient__is_sendable=True)
+        else:
+            valid_consent = UserConsent.objects.valid()
+        consents = valid_consent.filter(source__in=self.consent.all())
+        if segment is not None:
+            consents = consents.filter(segment.as_q(valid_consent))
+        # Someone who consented to several sources only gets one email
+        first_consent_per_email = (
+            consents.order_by()
+            .values("email_hash")
+            .annotate(first_id=Min("id"))
+            .values("first_id")
+        )
+        return UserConsent.objects.filter(id__in=first_consent_per_email)
+
+    def iter_recipients(self, segment=None, chunk_size=2000):
+        """
+        Yields a :class:`~django_consent.utils.Recipient` for each recipient of
+        :meth:`get_recipients`.
+        """
+        return utils.iter_recipients(
+            self.get_recipients(segment), chunk_size=chunk_size
+        )
+
+    def __str__(self):
+        return self.name
+
 
 class EmailOptOut(models.Model):
     """
@@ -300,9 +822,394 @@ class EmailOptOut(models.Model):
 
     email_hash = models.UUIDField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["email_hash"], name="optout_email_hash_idx"),
+            models.Index(
+                fields=["user", "is_everything"], name="optout_user_everything_idx"
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if self.consent_id is None:
             self.is_everything = True
         if not self.email_hash and self.user and self.user.email:
             self.email_hash = utils.get_email_hash(self.user.email)
         return super().save(*args, **kwargs)
+
+    @classmethod
+    def bulk_optout_email_hashes(cls, email_hashes, batch_size=1000):
+        """
+        Stores opt-outs of everything for many email hashes, for instance when
+        importing the suppression list of another email service. Hashes that
+        already opted out of everything are skipped.
+
+        :returns: The number of opt-outs created
+        """
+        created = 0
+        for chunk in utils.chunked(email_hashes, batch_size):
+            chunk = list(dict.fromkeys(chunk))
+            with transaction.atomic():
+                existing = set(
+                    cls.objects.filter(
+                        email_hash__in=chunk, is_everything=True
+                    ).values_list("email_hash", flat=True)
+                )
+                new = [email_hash for email_hash in chunk if email_hash not in existing]
+                cls.objects.bulk_create(
+                    [
+                        cls(email_hash=email_hash, is_everything=True)
+                        for email_hash in new
+                    ]
+                )
+            # bulk_create() doesn't send post_save
+            if consent_settings.MATERIALIZE_RECIPIENTS and new:
+                ConsentRecipient.objects.refresh(
+                    UserConsent.objects.filter(email_hash__in=new)
+                )
+            created += len(new)
+        return created
+
+
+class ConsentRecipientManager(models.Manager):
+    def refresh(self, consents):
+        """
+        Recomputes the rows of the consent in a UserConsent queryset.
+        """
+        consents = consents.filter(user__isnull=False).values_list(
+            "id", "source_id", "user_id", "email_hash"
+        )
+        for chunk in utils.chunked(consents.order_by("id").iterator(), 500):
+            ids = [row[0] for row in chunk]
+            sendable = set(
+                UserConsent.objects.filter(id__in=ids)
+                .valid()
+                .values_list("id", flat=True)
+            )
+            existing = set(
+                self.filter(consent_id__in=ids).values_list("consent_id", flat=True)
+            )
+            self.bulk_create(
+                [
+                    self.model(
+                        consent_id=consent_id,
+                        source_id=source_id,
+                        user_id=user_id,
+                        email_hash=email_hash,
+                        is_sendable=consent_id in sendable,
+                    )
+                    for consent_id, source_id, user_id, email_hash in chunk
+                    if consent_id not in existing
+                ]
+            )
+            existing_sendable = existing & sendable
+            if existing_sendable:
+                self.filter(consent_id__in=existing_sendable).update(is_sendable=True)
+            if existing - sendable:
+                self.filter(consent_id__in=existing - sendable).update(
+                    is_sendable=False
+                )
+
+    def rebuild(self):
+        """
+        Deletes and recreates all rows
+        """
+        with transaction.atomic():
+            self.all().delete()
+            self.refresh(UserConsent.objects.all())
+
+    def verify(self):
+        """
+        Compares the table to the consent it is supposed to reflect.
+
+        :returns: A list of consent IDs with missing or wrong rows
+        """
+        mismatches = []
+        consents = UserConsent.objects.filter(user__isnull=False)
+        consent_ids = consents.order_by("id").values_list("id", flat=True)
+        for ids in utils.chunked(consent_ids.iterator(), 1000):
+            sendable = set(
+                UserConsent.objects.filter(id__in=ids)
+                .valid()
+                .values_list("id", flat=True)
+            )
+            rows = dict(
+                self.filter(consent_id__in=ids).values_list("consent_id", "is_sendable")
+            )
+            mismatches += [
+                consent_id
+                for consent_id in ids
+                if rows.get(consent_id) != (consent_id in sendable)
+            ]
+        stale = self.exclude(consent__in=consents).values_list("consent_id", flat=True)
+        return mismatches + list(stale)
+
+
+class ConsentRecipient(models.Model):
+    """
+    A denormalized copy of whether a consent may currently be emailed, so
+    lists of recipients can be read from a single indexed table.
+
+    The rows are only maintained when ``settings.CONSENT_MATERIALIZE_RECIPIENTS``
+    is enabled. They are updated when consent is confirmed, opted out of (or
+    undone) and when users are deactivated or deleted. After enabling the
+    setting on an existing database, run ``manage.py consent_recipients
+    --rebuild``.
+    """
+
+    consent = models.OneToOneField(
+        UserConsent,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="recipient",
+    )
+    source = models.ForeignKey(
+        ConsentSource, on_delete=models.CASCADE, related_name="recipients"
+    )
+    # Deleting the user deletes the row: Without an email, there's no
+    # recipient
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    email_hash = models.UUIDField()
+    is_sendable = models.BooleanField(default=False)
+
+    objects = ConsentRecipientManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["source", "is_sendable"]),
+        ]
+
+
+class OutgoingEmailManager(models.Manager):
+    def claim(self, batch_size=100):
+        """
+        Marks a batch of emails that are due as being sent by the current
+        worker and returns them.
+
+        Rows are claimed with a random token, so several workers can run at
+        the same time without sending the same email twice. Claims expire
+        after ``settings.CONSENT_OUTBOX_CLAIM_TIMEOUT`` seconds, in case a
+        worker dies while sending.
+        """
+        now = timezone.now()
+        token = uuid.uuid4()
+        claimable = self.filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+            sent__isnull=True,
+            send_after__lte=now,
+            attempts__lt=consent_settings.OUTBOX_MAX_ATTEMPTS,
+        )
+        with transaction.atomic():
+            ids = list(
+                claimable.select_for_update(
+                    skip_locked=connections[
+                        self.db
+                    ].features.has_select_for_update_skip_locked
+                )
+                .order_by("send_after")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            # Filtering on claimable again guards against a concurrent worker
+            # on databases without row locks
+            claimable.filter(id__in=ids).update(
+                claim_token=token,
+                claimed_until=now
+                + timedelta(seconds=consent_settings.OUTBOX_CLAIM_TIMEOUT),
+            )
+        return list(
+            self.filter(claim_token=token, sent__isnull=True).select_related(
+                "consent__user", "consent__source"
+            )
+        )
+
+
+class OutgoingEmail(models.Model):
+    """
+    An email waiting to be sent by ``manage.py consent_outbox_worker``, so
+    the request that caused it doesn't have to wait for the mail server.
+
+    Failed attempts are retried with an exponentially growing delay, until
+    ``settings.CONSENT_OUTBOX_MAX_ATTEMPTS`` is reached.
+    """
+
+    CONFIRMATION = "confirmation"
+    EMAIL_TYPES = [
+        (CONFIRMATION, _("confirmation")),
+    ]
+
+    consent = models.ForeignKey(
+        UserConsent, on_delete=models.CASCADE, related_name="outgoing_emails"
+    )
+    email_type = models.CharField(max_length=32, choices=EMAIL_TYPES)
+    created = models.DateTimeField(auto_now_add=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    sent = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    claim_token = models.UUIDField(null=True, editable=False)
+    claimed_until = models.DateTimeField(null=True, editable=False)
+
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        indexes = [
+            # Finds emails that are due
+            models.Index(
+                fields=["send_after"],
+                condition=Q(sent__isnull=True),
+                name="outgoing_email_due_idx",
+            ),
+            models.Index(fields=["claim_token"], name="outgoing_email_claim_idx"),
+        ]
+
+    def get_email_class(self):
+        if self.email_type == self.CONFIRMATION:
+            return emails.ConfirmationNeededEmail
+        raise ValueError("Unknown email type: {}".format(self.email_type))
+
+    def get_email_batch(self):
+        """
+        Returns an :class:`~django_consent.emails.EmailBatch` for creating
+        emails of this type
+        """
+        return emails.EmailBatch(self.get_email_class())
+
+    def get_email(self, connection=None, batch=None):
+        """
+        Returns the email message to send
+        """
+        kwargs = {
+            "user": self.consent.user,
+            "consent": self.consent,
+            "connection": connection,
+        }
+        if batch:
+            return batch.create(**kwargs)
+        return self.get_email_class()(**kwargs)
+
+    def get_retry_delay(self):
+        return timedelta(
+            seconds=consent_settings.OUTBOX_RETRY_DELAY * 2 ** (self.attempts - 1)
+        )
+
+
+class ConsentStatisticsManager(models.Manager):
+    def get_bucket(self, when=None):
+        """
+        Returns the start of the hour or day (in UTC if ``settings.USE_TZ`` is
+        enabled) that ``when`` is counted in, see
+        ``settings.CONSENT_STATISTICS_BUCKET``
+        """
+        when = when or timezone.now()
+        if settings.USE_TZ:
+            when = when.astimezone(timezone.utc)
+        when = when.replace(minute=0, second=0, microsecond=0)
+        if consent_settings.STATISTICS_BUCKET == "day":
+            when = when.replace(hour=0)
+        return when
+
+    def increment(self, source_id, **counts):
+        """
+        Adds to the counters of a source in the current bucket with an atomic
+        ``UPDATE``, and creates the bucket if it's the first count in it. Does
+        nothing unless ``settings.CONSENT_STATISTICS`` is enabled.
+        """
+        counts = {name: count for name, count in counts.items() if count}
+        if not consent_settings.STATISTICS or not counts:
+            return
+        bucket = self.get_bucket()
+        increments = {name: F(name) + count for name, count in counts.items()}
+        if self.filter(source_id=source_id, bucket=bucket).update(**increments):
+            return
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(source_id=source_id, bucket=bucket, **counts)
+        except IntegrityError:
+            # Created by a concurrent request
+            self.filter(source_id=source_id, bucket=bucket).update(**increments)
+
+    def increment_many(self, counts_by_source, name):
+        """
+        Adds ``{source_id: count}`` to the counter ``name`` of each source
+        """
+        for source_id, count in counts_by_source.items():
+            self.increment(source_id, **{name: count})
+
+    def totals(self, source=None, since=None, until=None):
+        """
+        Returns the sums of all counters, optionally for one source and a period
+        """
+        statistics = self.all()
+        if source is not None:
+            statistics = statistics.filter(source=source)
+        if since is not None:
+            statistics = statistics.filter(bucket__gte=self.get_bucket(since))
+        if until is not None:
+            statistics = statistics.filter(bucket__lt=until)
+        totals = statistics.aggregate(
+            **{name: Sum(name) for name in ConsentStatistics.COUNTERS}
+        )
+        return {name: total or 0 for name, total in totals.items()}
+
+    def rebuild(self):
+        """
+        Recreates all counters from consent and opt-outs. Confirmations are
+        counted when the consent was last modified, and undone opt-outs can't
+        be recovered since they were deleted.
+        """
+        trunc = TruncDay if consent_settings.STATISTICS_BUCKET == "day" else TruncHour
+        queries = {
+            "signups": UserConsent.objects.order_by()
+            .values_list("source_id")
+            .annotate(bucket=trunc("created", tzinfo=timezone.utc)),
+            "confirmations": UserConsent.objects.filter(email_confirmed=True)
+            .order_by()
+            .values_list("source_id")
+            .annotate(bucket=trunc("modified", tzinfo=timezone.utc)),
+            "optouts": EmailOptOut.objects.filter(consent__isnull=False)
+            .order_by()
+            .values_list("consent__source_id")
+            .annotate(bucket=trunc("created", tzinfo=timezone.utc)),
+        }
+        buckets = {}
+        for name, query in queries.items():
+            for source_id, bucket, count in query.annotate(count=Count("pk")):
+                statistics = buckets.setdefault(
+                    (source_id, bucket),
+                    ConsentStatistics(source_id=source_id, bucket=bucket),
+                )
+                setattr(statistics, name, count)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(buckets.values(), batch_size=1000)
+        return len(buckets)
+
+
+class ConsentStatistics(models.Model):
+    """
+    Counts of what happened to the consent of a source during an hour or a day,
+    for showing statistics without counting rows of the large tables. Enabled
+    with ``settings.CONSENT_STATISTICS``.
+    """
+
+    #: The names of the counters
+    COUNTERS = ["signups", "confirmations", "optouts", "optouts_undone"]
+
+    source = models.ForeignKey(
+        ConsentSource, related_name="statistics", on_delete=models.CASCADE
+    )
+    bucket = models.DateTimeField(help_text=_("Start of the hour or day counted"))
+    signups = models.PositiveIntegerField(default=0)
+    confirmations = models.PositiveIntegerField(default=0)
+    optouts = models.PositiveIntegerField(default=0)
+    optouts_undone = models.PositiveIntegerField(default=0)
+
+    objects = ConsentStatisticsManager()
+
+    class Meta:
+        unique_together = ("source", "bucket")
+        verbose_name_plural = _("consent statistics")
+
+    def __str__(self):
+        return "{} {}".format(self.source_id, self.bucket)
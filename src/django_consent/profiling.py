@@ -0,0 +1,235 @@
+"""
+Counts the queries, SQL time and cache round-trips of consent views and other
+operations, to find out why a page is slow.
+
+Add the middleware to ``settings.MIDDLEWARE`` to profile every consent view::
+
+    MIDDLEWARE = [
+        ...
+        "django_consent.profiling.QueryProfilerMiddleware",
+    ]
+
+Results are logged to the ``django_consent.profiling`` logger, and optionally
+sent in an ``X-Consent-Profile`` header. Use
+``settings.CONSENT_PROFILING_SAMPLE_RATE`` to only profile a fraction of the
+requests in production.
+
+Any other code can be profiled with :func:`profile`::
+
+    with profiling.profile("import") as result:
+        UserConsent.bulk_capture_email_consent(source, emails)
+    print(result.queries, result.duplicates)
+"""
+import contextvars
+import functools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import settings as consent_settings
+
+logger = logging.getLogger(__name__)
+
+#: Cache methods counted as one round-trip each
+CACHE_METHODS = [
+    "add",
+    "get",
+    "set",
+    "touch",
+    "delete",
+    "get_many",
+    "has_key",
+    "incr",
+    "decr",
+    "set_many",
+    "delete_many",
+]
+
+HEADER = "X-Consent-Profile"
+
+_current = contextvars.ContextVar("consent_profile", default=None)
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+class Profile:
+    """
+    What was measured while :func:`profile` was active
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_calls = 0
+        self.time = 0.0
+        self._statements = Counter()
+        # Cache methods calling each other are one round-trip
+        self._in_cache = False
+
+    @property
+    def duplicates(self):
+        """
+        Queries that had already been run with the same parameters
+        """
+        return sum(count - 1 for count in self._statements.values())
+
+    def get_duplicate_queries(self):
+        """
+        Returns the SQL of duplicate queries and how often each was run, the
+        most frequent first
+        """
+        return [
+            (sql, count)
+            for (sql, params), count in self._statements.most_common()
+            if count > 1
+        ]
+
+    def as_header(self):
+        return "queries={};duplicates={};sql_ms={:.1f};cache={};ms={:.1f}".format(
+            self.queries,
+            self.duplicates,
+            self.sql_time * 1000,
+            self.cache_calls,
+            self.time * 1000,
+        )
+
+    def __str__(self):
+        return "{}: {} queries ({} duplicates) in {:.1f} ms, {} cache calls, {:.1f} ms in total".format(
+            self.name,
+            self.queries,
+            self.duplicates,
+            self.sql_time * 1000,
+            self.cache_calls,
+            self.time * 1000,
+        )
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.sql_time += time.perf_counter() - started
+        current.queries += 1
+        current._statements[(sql, repr(params))] += 1
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _wrap_cache_method(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        current = _current.get()
+        if current is None or current._in_cache:
+            return method(*args, **kwargs)
+        current.cache_calls += 1
+        current._in_cache = True
+        try:
+            return method(*args, **kwargs)
+        finally:
+            current._in_cache = False
+
+    wrapper.__wrapped_by_profiling__ = True
+    return wrapper
+
+
+def install():
+    """
+    Starts measuring all connections and caches. Until :func:`profile` is
+    used, this only costs a check per query and cache call.
+
+    Connections that other threads opened before this aren't measured, which
+    is why the middleware calls it when it's loaded.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(_add_execute_wrapper)
+        # Connections that are already open in this thread
+        for connection in connections.all():
+            _add_execute_wrapper(connection)
+        for alias in settings.CACHES:
+            cache_class = type(caches[alias])
+            for name in CACHE_METHODS:
+                method = getattr(cache_class, name)
+                if not getattr(method, "__wrapped_by_profiling__", False):
+                    setattr(cache_class, name, _wrap_cache_method(method))
+        _installed = True
+
+
+@contextmanager
+def profile(name, log=True):
+    """
+    Measures the queries and cache calls of the code in the ``with`` block
+
+    :param: log: Log the results to the ``django_consent.profiling`` logger
+    when the block ends.
+    """
+    install()
+    result = Profile(name)
+    token = _current.set(result)
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.time = time.perf_counter() - started
+        _current.reset(token)
+        if log:
+            log_profile(result)
+
+
+def log_profile(result):
+    duplicates = result.get_duplicate_queries()
+    if duplicates:
+        sql, count = duplicates[0]
+        logger.info("%s. Most duplicated (%d times): %s", result, count, sql)
+    else:
+        logger.info("%s", result)
+
+
+def is_consent_view(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return False
+    view = getattr(match.func, "view_class", match.func)
+    return view.__module__.startswith("django_consent.")
+
+
+class QueryProfilerMiddleware:
+    """
+    Profiles a sample of the requests to consent views
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        if random.random() >= consent_settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        name = "{} {}".format(request.method, request.path)
+        with profile(name, log=False) as result:
+            response = self.get_response(request)
+        # The view is only known once the URL has been resolved
+        if is_consent_view(request):
+            log_profile(result)
+            if consent_settings.PROFILING_HEADER:
+                response[HEADER] = result.as_header()
+        return response
@@ -0,0 +1,102 @@
+"""
+Deletes consent that was never confirmed, and the placeholder users created
+for it by :meth:`~django_consent.models.UserConsent.capture_email_consent`.
+
+Rows are deleted in small transactions in the order of their primary key, so
+the tables are never locked for long, and the job can be stopped and run again
+at any time. Opt-outs are kept: their ``consent`` and ``user`` are set to
+``NULL``, and their email hash keeps the email from being imported again.
+"""
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import OuterRef
+from django.db.models import Q
+from django.utils import timezone
+
+from . import models
+from . import settings as consent_settings
+
+
+def get_stale_consent(age=None):
+    """
+    Returns unconfirmed consent to sources requiring a confirmed email, which
+    was created and last asked to confirm more than ``age`` seconds ago
+
+    :param: age: Defaults to ``settings.CONSENT_PURGE_UNCONFIRMED_AFTER``.
+    """
+    if age is None:
+        age = consent_settings.PURGE_UNCONFIRMED_AFTER
+    before = timezone.now() - timedelta(seconds=age)
+    return models.UserConsent.objects.filter(
+        Q(email_confirmation_requested__isnull=True)
+        | Q(email_confirmation_requested__lt=before),
+        email_confirmed=False,
+        created__lt=before,
+        source__requires_confirmed_email=True,
+    )
+
+
+def get_placeholder_users(user_ids):
+    """
+    Returns the users of ``user_ids`` that were only created to store consent:
+    They never logged in, are inactive, have an unusable password and don't
+    have any consent left.
+    """
+    return get_user_model().objects.filter(
+        ~Exists(models.UserConsent.objects.filter(user=OuterRef("pk"))),
+        pk__in=user_ids,
+        is_active=False,
+        last_login__isnull=True,
+        password__startswith=UNUSABLE_PASSWORD_PREFIX,
+    )
+
+
+def _purge_chunk(stale, pks):
+    with transaction.atomic():
+        # Consent may have been confirmed since the chunk was read
+        chunk = stale.filter(pk__in=pks)
+        user_ids = list(chunk.exclude(user=None).values_list("user_id", flat=True))
+        consents = chunk.delete()[1].get(models.UserConsent._meta.label, 0)
+        users = get_placeholder_users(user_ids).delete()[1]
+    return consents, users.get(get_user_model()._meta.label, 0)
+
+
+def purge_unconfirmed(age=None, chunk_size=500, sleep=0, progress=None):
+    """
+    Deletes the consent returned by :func:`get_stale_consent` and the
+    placeholder users left without consent, ``chunk_size`` consents per
+    transaction.
+
+    :param: sleep: Seconds to wait between chunks, giving other queries and
+    replicas time to catch up.
+    :param: progress: Optional callable which is invoked after each chunk
+    with the number of consents and users deleted so far.
+
+    :returns: A tuple with the number of consents and users deleted
+    """
+    stale = get_stale_consent(age)
+    consents = users = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            stale.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not pks:
+            break
+        # Waits between chunks, not after the last one
+        if last_pk and sleep:
+            time.sleep(sleep)
+        last_pk = pks[-1]
+        deleted_consents, deleted_users = _purge_chunk(stale, pks)
+        consents += deleted_consents
+        users += deleted_users
+        if progress:
+            progress(consents, users)
+    return consents, users
@@ -0,0 +1,202 @@
+"""
+Creates the consent sources defined in ``settings.CONSENT_SEED``, for instance
+the source of a newsletter signup form that is part of the website::
+
+    CONSENT_SEED = {
+        "newsletter": {
+            "source_name": "Newsletter",
+            "definition": "You agree to receive our monthly newsletter",
+            "requires_confirmed_email": True,
+            "translations": {
+                "da": {
+                    "source_name": "Nyhedsbrev",
+                    "definition": "Du accepterer at modtage vores nyhedsbrev",
+                },
+            },
+        },
+    }
+
+The keys are stored as ``ConsentSource.auto_create_id``, and the source can be
+looked up with :meth:`~django_consent.models.ConsentSource.get_by_key`.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.db import transaction
+from django.utils import timezone
+
+from . import models
+from . import settings as consent_settings
+
+SOURCE_FIELDS = [
+    "source_name",
+    "definition",
+    "requires_confirmed_email",
+    "requires_active_user",
+]
+
+TRANSLATION_FIELDS = ["source_name", "definition"]
+
+
+def _get_existing(keys, using):
+    """
+    Returns the seeded sources and their translations as dicts, read with one
+    query
+    """
+    existing = {}
+    sources = models.ConsentSource.objects.using(using)
+    rows = sources.filter(auto_create_id__in=keys).values(
+        "id",
+        "auto_create_id",
+        *SOURCE_FIELDS,
+        *("translations__" + field for field in ["id", "language_code"]),
+        *("translations__" + field for field in TRANSLATION_FIELDS),
+    )
+    for row in rows:
+        source = existing.setdefault(
+            row["auto_create_id"],
+            {"id": row["id"], "translations": {}, **{f: row[f] for f in SOURCE_FIELDS}},
+        )
+        if row["translations__id"]:
+            source["translations"][row["translations__language_code"]] = {
+                "id": row["translations__id"],
+                **{f: row["translations__" + f] for f in TRANSLATION_FIELDS},
+            }
+    return existing
+
+
+def _get_changes(values, existing, fields):
+    return {
+        field: values[field]
+        for field in fields
+        if field in values and values[field] != existing[field]
+    }
+
+
+def _seed_sources(seed, existing, update, using):
+    sources = models.ConsentSource.objects.using(using)
+    new_sources = []
+    changed_sources = []
+    changed_fields = set()
+    for key, values in seed.items():
+        if key not in existing:
+            new_sources.append(
+                models.ConsentSource(
+                    auto_create_id=key,
+                    **{f: values[f] for f in SOURCE_FIELDS if f in values},
+                )
+            )
+        elif update:
+            changes = _get_changes(values, existing[key], SOURCE_FIELDS)
+            if changes:
+                changed_sources.append(
+                    models.ConsentSource(
+                        id=existing[key]["id"],
+                        auto_create_id=key,
+                        modified=timezone.now(),
+                        **changes,
+                    )
+                )
+                changed_fields.update(changes)
+
+    if new_sources:
+        sources.bulk_create(new_sources)
+        # Not all databases return the IDs of created rows
+        existing.update(
+            (key, {"id": id, "translations": {}})
+            for key, id in sources.filter(
+                auto_create_id__in=[s.auto_create_id for s in new_sources]
+            ).values_list("auto_create_id", "id")
+        )
+    if changed_sources:
+        sources.bulk_update(changed_sources, list(changed_fields) + ["modified"])
+    return new_sources, changed_sources, changed_fields
+
+
+def _seed_translations(seed, existing, update, using):
+    new_translations = []
+    changed_translations = []
+    for key, values in seed.items():
+        source = existing[key]
+        for language, translation in values.get("translations", {}).items():
+            found = source["translations"].get(language)
+            if found and not (
+                update and _get_changes(translation, found, TRANSLATION_FIELDS)
+            ):
+                continue
+            instance = models.ConsentSourceTranslation(
+                consent_source_id=source["id"], language_code=language, **translation
+            )
+            if found:
+                instance.id = found["id"]
+                changed_translations.append(instance)
+            else:
+                new_translations.append(instance)
+    translations = models.ConsentSourceTranslation.objects.using(using)
+    translations.bulk_create(new_translations)
+    translations.bulk_update(changed_translations, TRANSLATION_FIELDS)
+    return new_translations, changed_translations
+
+
+def seed(seed=None, update=False, using=DEFAULT_DB_ALIAS):
+    """
+    Creates the sources and translations of ``settings.CONSENT_SEED`` that
+    don't exist. Running it again doesn't change anything.
+
+    :param: update: Also update sources and translations that differ from the
+    seed, which overwrites changes made in the admin.
+    :param: using: The database to seed.
+
+    :returns: A tuple with the number of sources and translations created and
+    updated
+    """
+    seed = consent_settings.SEED if seed is None else seed
+    if not seed:
+        return 0, 0
+
+    with transaction.atomic(using=using):
+        existing = _get_existing(list(seed), using)
+        new_sources, changed_sources, changed_fields = _seed_sources(
+            seed, existing, update, using
+        )
+        new_translations, changed_translations = _seed_translations(
+            seed, existing, update, using
+        )
+
+    # Bulk queries don't send the signals which clear caches. Missing sources
+    # and translations may have been cached too.
+    for source in new_sources + changed_sources:
+        models.ConsentSource.invalidate_cache(source.auto_create_id)
+    for translation in new_translations + changed_translations:
+        models.ConsentSourceTranslation.invalidate_cache(
+            translation.consent_source_id, translation.language_code
+        )
+    if consent_settings.MATERIALIZE_RECIPIENTS and changed_fields & {
+        "requires_confirmed_email",
+        "requires_active_user",
+    }:
+        models.ConsentRecipient.objects.db_manager(using).refresh(
+            models.UserConsent.objects.using(using).filter(
+                source_id__in=[source.id for source in changed_sources]
+            )
+        )
+
+    created = len(new_sources) + len(new_translations)
+    return created, len(changed_sources) + len(changed_translations)
+
+
+def post_migrate_seed(sender, using=DEFAULT_DB_ALIAS, apps=None, plan=None, **kwargs):
+    """
+    Seeds the database after ``migrate``, also when no migrations were
+    pending, so changes to ``settings.CONSENT_SEED`` are picked up. Nothing is
+    done when migrating backwards or when the tables don't match the current
+    models yet.
+    """
+    if any(backwards for __, backwards in plan or []):
+        return
+    try:
+        source_model = apps.get_model("django_consent", "ConsentSource")
+    except LookupError:
+        return
+    field_names = {field.name for field in source_model._meta.get_fields()}
+    if not field_names.issuperset(SOURCE_FIELDS + ["auto_create_id"]):
+        return
+    seed(using=using)
@@ -0,0 +1,69 @@
+"""
+Segments select who receives an :class:`~django_consent.models.EmailCampaign`
+by combining consent sources with ``|`` (or), ``&`` (and) and ``~`` (not).
+For instance, people who consented to A or B, but not to C::
+
+    segment = (Source(a) | Source(b)) & ~Source(c)
+    campaign.get_recipients(segment)
+
+A segment is compiled to subqueries of a single SQL statement.
+"""
+from django.db.models import Q
+
+
+class Segment:
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def as_q(self, valid_consent):
+        """
+        Returns a Q object for filtering UserConsent by whether the email of the
+        consent is in the segment.
+
+        :param: valid_consent: A queryset of all valid consent
+        """
+        raise NotImplementedError()
+
+
+class Source(Segment):
+    """
+    Everyone with valid consent from a source
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def as_q(self, valid_consent):
+        return Q(
+            email_hash__in=valid_consent.filter(source=self.source).values("email_hash")
+        )
+
+
+class Combination(Segment):
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+
+
+class Or(Combination):
+    def as_q(self, valid_consent):
+        return self.left.as_q(valid_consent) | self.right.as_q(valid_consent)
+
+
+class And(Combination):
+    def as_q(self, valid_consent):
+        return self.left.as_q(valid_consent) & self.right.as_q(valid_consent)
+
+
+class Not(Segment):
+    def __init__(self, segment):
+        self.segment = segment
+
+    def as_q(self, valid_consent):
+        return ~self.segment.as_q(valid_consent)
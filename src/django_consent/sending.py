@@ -0,0 +1,221 @@
+import time
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db.models import F
+from django.db.models import Q
+from django.utils import timezone
+from django.utils import translation
+
+from . import emails
+from . import models
+from . import settings as consent_settings
+from . import throttling
+from . import utils
+
+
+def send_campaign(
+    campaign,
+    email_class,
+    segment=None,
+    batch_size=500,
+    connection=None,
+    progress=None,
+    get_language=None,
+):
+    """
+    Sends an email to each recipient of an
+    :class:`~django_consent.models.EmailCampaign`.
+
+    Recipients are streamed from :meth:`EmailCampaign.iter_recipients` and
+    messages are built in batches, which are all sent through one open
+    connection to the mail server. The site and templates are looked up once,
+    see :class:`~django_consent.emails.EmailBatch`.
+
+    :param: email_class: A subclass of :class:`~django_consent.emails.BaseEmail`.
+    It's created with ``to``, ``recipient_name`` and a context containing the
+    ``recipient`` and the ``campaign``.
+    :param: progress: Optional callable which is invoked after each batch
+    with the number of messages sent and the seconds elapsed.
+    :param: get_language: Optional callable returning the language code to
+    render the email in for a :class:`~django_consent.utils.Recipient`.
+
+    :returns: The number of messages sent
+    """
+    connection = connection or get_connection()
+    email_batch = emails.EmailBatch(email_class)
+
+    def create_messages(recipients):
+        return [
+            email_batch.create(
+                to=[recipient.email],
+                recipient_name=recipient.name,
+                context={"recipient": recipient, "campaign": campaign},
+                connection=connection,
+            )
+            for recipient in recipients
+        ]
+
+    sent = 0
+    started = time.monotonic()
+    with connection:
+        recipients = campaign.iter_recipients(segment, chunk_size=batch_size)
+        for batch in utils.chunked(recipients, batch_size):
+            if not get_language:
+                messages = create_messages(batch)
+            else:
+                messages = []
+                for language, group in emails.group_by_language(batch, get_language):
+                    with translation.override(language):
+                        messages += create_messages(group)
+            sent += connection.send_messages(messages) or 0
+            if progress:
+                progress(sent, time.monotonic() - started)
+    return sent
+
+
+def send_outbox(batch_size=100, connection=None):
+    """
+    Claims a batch of due :class:`~django_consent.models.OutgoingEmail` and
+    sends them through one connection. Failed emails are scheduled for a
+    retry.
+
+    :returns: A tuple with the number of emails sent and failed
+    """
+    outgoing = models.OutgoingEmail.objects.claim(batch_size)
+    if not outgoing:
+        return 0, 0
+    connection = connection or get_connection()
+    email_batches = {}
+    sent = []
+    failed = 0
+    with connection:
+        for outgoing_email in outgoing:
+            try:
+                email_type = outgoing_email.email_type
+                if email_type not in email_batches:
+                    email_batches[email_type] = outgoing_email.get_email_batch()
+                connection.send_messages(
+                    [
+                        outgoing_email.get_email(
+                            connection, batch=email_batches[email_type]
+                        )
+                    ]
+                )
+            except Exception as e:
+                outgoing_email.attempts += 1
+                outgoing_email.last_error = repr(e)
+                outgoing_email.send_after = (
+                    timezone.now() + outgoing_email.get_retry_delay()
+                )
+                outgoing_email.claim_token = outgoing_email.claimed_until = None
+                outgoing_email.save()
+                failed += 1
+            else:
+                sent.append(outgoing_email)
+
+    now = timezone.now()
+    models.OutgoingEmail.objects.filter(id__in=[o.id for o in sent]).update(
+        sent=now, attempts=F("attempts") + 1, claim_token=None, claimed_until=None
+    )
+    models.UserConsent.objects.filter(
+        id__in=[o.consent_id for o in sent if o.email_type == o.CONFIRMATION]
+    ).update(email_confirmation_requested=now)
+    return len(sent), failed
+
+
+def _iter_overdue_batches(queryset, batch_size):
+    """
+    Reads overdue consent in the order of the index, continuing after the last
+    consent of the previous batch
+    """
+    queryset = queryset.order_by("email_confirmation_requested", "pk")
+    last = None
+    while True:
+        batch = queryset
+        if last:
+            batch = batch.filter(
+                Q(email_confirmation_requested__gt=last.email_confirmation_requested)
+                | Q(email_confirmation_requested=last.email_confirmation_requested)
+                & Q(pk__gt=last.pk)
+            )
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def _send_reminder_batch(connection, email_batch, batch):
+    # Sent one by one over the open connection, to only record the reminders
+    # that the backend sent, also when it raises partway through the batch
+    reminded = []
+    try:
+        for consent in batch:
+            message = email_batch.create(
+                user=consent.user, consent=consent, connection=connection
+            )
+            if connection.send_messages([message]):
+                reminded.append(consent.pk)
+    finally:
+        models.UserConsent.objects.filter(pk__in=reminded).update(
+            email_confirmation_requested=timezone.now(),
+            email_confirmation_reminders=F("email_confirmation_reminders") + 1,
+        )
+    return len(reminded)
+
+
+def send_confirmation_reminders(
+    batch_size=500,
+    rate=None,
+    delay=None,
+    max_reminders=None,
+    connection=None,
+    progress=None,
+):
+    """
+    Sends :class:`~django_consent.emails.ConfirmationNeededEmail` again to
+    consent whose confirmation is overdue, see
+    :meth:`~django_consent.models.UserConsentQuerySet.confirmation_overdue`.
+    Batches are sent through one connection, and each reminder is recorded in
+    ``email_confirmation_requested`` and ``email_confirmation_reminders``.
+
+    :param: rate: Optional rate like ``"10/s"`` or ``"1000/h"``, which batches
+    are delayed to stay below.
+    :param: delay: Seconds since the last request to confirm, defaults to
+    ``settings.CONSENT_CONFIRMATION_REMINDER_DELAY``.
+    :param: max_reminders: Defaults to
+    ``settings.CONSENT_CONFIRMATION_REMINDER_MAX``.
+    :param: progress: Optional callable which is invoked after each batch
+    with the number of reminders sent and the seconds elapsed.
+
+    :returns: The number of reminders sent
+    """
+    if delay is None:
+        delay = consent_settings.CONFIRMATION_REMINDER_DELAY
+    if max_reminders is None:
+        max_reminders = consent_settings.CONFIRMATION_REMINDER_MAX
+    seconds_per_email = 0
+    if rate:
+        limit, period = throttling.parse_rate(rate)
+        seconds_per_email = period / limit
+
+    overdue = models.UserConsent.objects.confirmation_overdue(
+        timezone.now() - timedelta(seconds=delay), max_reminders
+    ).select_related("user", "source")
+    connection = connection or get_connection()
+    email_batch = emails.EmailBatch(emails.ConfirmationNeededEmail)
+    sent = 0
+    started = time.monotonic()
+    next_batch_at = started
+    with connection:
+        for batch in _iter_overdue_batches(overdue, batch_size):
+            # Waits for the rate limit between batches, not after the last one
+            wait = next_batch_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_batch_at = time.monotonic() + len(batch) * seconds_per_email
+            sent += _send_reminder_batch(connection, email_batch, batch)
+            if progress:
+                progress(sent, time.monotonic() - started)
+    return sent
@@ -14,5 +14,103 @@ UNSUBSCRIBE_ALL_SALT = getattr(
 #: You can harden security by adding a different salt in your project's settings
 CONFIRM_SALT = getattr(settings, "CONSENT_CONFIRM_SALT", "django-consent-confirm")
 
-#: For more information, `django-ratelimit <https://django-ratelimit.readthedocs.io/en/stable/>`__
+#: A rate like ``"100/h"``, or a dict with the rate and options of the limiter,
+#: see :mod:`django_consent.throttling`. For more information,
+#: `django-ratelimit <https://django-ratelimit.readthedocs.io/en/stable/>`__
 RATELIMIT = getattr(settings, "CONSENT_RATELIMIT", "100/h")
+
+#: Maintain the :class:`~django_consent.models.ConsentRecipient` table and use
+#: it for looking up valid consent
+MATERIALIZE_RECIPIENTS = getattr(settings, "CONSENT_MATERIALIZE_RECIPIENTS", False)
+
+#: Number of translations of consent sources cached in each process
+TRANSLATION_CACHE_SIZE = getattr(settings, "CONSENT_TRANSLATION_CACHE_SIZE", 1000)
+
+#: Seconds before a cached translation is looked up again. Other processes
+#: aren't told when translations change, so they may use the old translation
+#: for this long.
+TRANSLATION_CACHE_TIMEOUT = getattr(settings, "CONSENT_TRANSLATION_CACHE_TIMEOUT", 300)
+
+#: Optional alias of a cache in ``settings.CACHES`` which shares cached
+#: translations between processes
+TRANSLATION_CACHE_BACKEND = getattr(settings, "CONSENT_TRANSLATION_CACHE_BACKEND", None)
+
+#: The backend that :class:`~django_consent.backends.ConsentEmailBackend` sends
+#: through after removing recipients who opted out
+EMAIL_BACKEND = getattr(
+    settings, "CONSENT_EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend"
+)
+
+#: Seconds between reading new opt-outs into the suppression index
+SUPPRESSION_REFRESH_INTERVAL = getattr(
+    settings, "CONSENT_SUPPRESSION_REFRESH_INTERVAL", 60
+)
+
+#: Seconds between complete rebuilds of the suppression index, which is when
+#: undone opt-outs are removed from it
+SUPPRESSION_REBUILD_INTERVAL = getattr(
+    settings, "CONSENT_SUPPRESSION_REBUILD_INTERVAL", 3600
+)
+
+#: Queue confirmation emails in :class:`~django_consent.models.OutgoingEmail`
+#: instead of sending them during the request. Run ``manage.py
+#: consent_outbox_worker`` to send them.
+EMAIL_OUTBOX = getattr(settings, "CONSENT_EMAIL_OUTBOX", False)
+
+#: Attempts at sending a queued email before giving up
+OUTBOX_MAX_ATTEMPTS = getattr(settings, "CONSENT_OUTBOX_MAX_ATTEMPTS", 5)
+
+#: Seconds before the first retry of a failed email, doubled for every retry
+OUTBOX_RETRY_DELAY = getattr(settings, "CONSENT_OUTBOX_RETRY_DELAY", 60)
+
+#: Seconds before an email claimed by a worker may be claimed by another
+#: worker, in case the first one died
+OUTBOX_CLAIM_TIMEOUT = getattr(settings, "CONSENT_OUTBOX_CLAIM_TIMEOUT", 600)
+
+#: Secret keys for signing the tokens in links. The first key signs new tokens,
+#: and tokens signed with the others are still accepted, so keys can be
+#: rotated. Defaults to ``[settings.SECRET_KEY]``.
+TOKEN_KEYS = getattr(settings, "CONSENT_TOKEN_KEYS", None)
+
+#: Consent sources created by ``manage.py migrate`` and ``manage.py
+#: consent_seed``, by their ``auto_create_id``. See
+#: :mod:`django_consent.seeding`.
+SEED = getattr(settings, "CONSENT_SEED", {})
+
+#: Count signups, confirmations and opt-outs per source in
+#: :class:`~django_consent.models.ConsentStatistics`. This adds a query to each
+#: of these actions.
+STATISTICS = getattr(settings, "CONSENT_STATISTICS", False)
+
+#: Whether statistics are counted per ``"hour"`` or per ``"day"``. Run
+#: ``manage.py consent_statistics --rebuild`` after changing it.
+STATISTICS_BUCKET = getattr(settings, "CONSENT_STATISTICS_BUCKET", "day")
+
+#: Where counters and timings of consent operations and emails are sent, a
+#: dict with the dotted path of a ``"sink"`` and its options. See
+#: :mod:`django_consent.metrics`.
+METRICS = getattr(settings, "CONSENT_METRICS", None)
+
+#: Fraction of requests to consent views that
+#: :class:`~django_consent.profiling.QueryProfilerMiddleware` profiles, between
+#: ``0`` and ``1``.
+PROFILING_SAMPLE_RATE = getattr(settings, "CONSENT_PROFILING_SAMPLE_RATE", 1.0)
+
+#: Send the results of profiling in an ``X-Consent-Profile`` response header.
+#: This shows how many queries a page runs, so only enable it where that's fine.
+PROFILING_HEADER = getattr(settings, "CONSENT_PROFILING_HEADER", False)
+
+#: Seconds after asking to confirm an email before ``manage.py
+#: consent_send_reminders`` sends a reminder, and between reminders
+CONFIRMATION_REMINDER_DELAY = getattr(
+    settings, "CONSENT_CONFIRMATION_REMINDER_DELAY", 7 * 24 * 60 * 60
+)
+
+#: The most reminders to confirm an email sent for each consent
+CONFIRMATION_REMINDER_MAX = getattr(settings, "CONSENT_CONFIRMATION_REMINDER_MAX", 2)
+
+#: Seconds after which ``manage.py consent_purge`` deletes consent that was
+#: never confirmed, along with the placeholder users created for it
+PURGE_UNCONFIRMED_AFTER = getattr(
+    settings, "CONSENT_PURGE_UNCONFIRMED_AFTER", 90 * 24 * 60 * 60
+)
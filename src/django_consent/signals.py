@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+from . import models
+from . import settings as consent_settings
+
+
+def refresh_consent_recipient(sender, instance, **kwargs):
+    if consent_settings.MATERIALIZE_RECIPIENTS:
+        models.ConsentRecipient.objects.refresh(
+            models.UserConsent.objects.filter(pk=instance.pk)
+        )
+
+
+def refresh_source_recipients(sender, instance, created=False, **kwargs):
+    # Only the requirements of the source change which consent is sendable
+    if (
+        consent_settings.MATERIALIZE_RECIPIENTS
+        and not created
+        and instance.requirements_changed()
+    ):
+        models.ConsentRecipient.objects.refresh(instance.consents.all())
+    instance.remember_requirements()
+
+
+def refresh_optout_recipients(sender, instance, **kwargs):
+    if consent_settings.MATERIALIZE_RECIPIENTS:
+        affected = Q(email_hash=instance.email_hash)
+        if instance.user_id:
+            affected |= Q(user_id=instance.user_id)
+        if instance.consent_id:
+            affected |= Q(pk=instance.consent_id)
+        models.ConsentRecipient.objects.refresh(
+            models.UserConsent.objects.filter(affected)
+        )
+
+
+def refresh_user_recipients(sender, instance, update_fields=None, **kwargs):
+    if not consent_settings.MATERIALIZE_RECIPIENTS:
+        return
+    # Saves that cannot have changed is_active, like updating last_login
+    if update_fields is not None and "is_active" not in update_fields:
+        return
+    models.ConsentRecipient.objects.refresh(
+        models.UserConsent.objects.filter(user=instance)
+    )
+
+
+def invalidate_source_cache(sender, instance, **kwargs):
+    if instance.auto_create_id:
+        models.ConsentSource.invalidate_cache(instance.auto_create_id)
+
+
+def invalidate_translation_cache(sender, instance, **kwargs):
+    models.ConsentSourceTranslation.invalidate_cache(
+        instance.consent_source_id, instance.language_code
+    )
+
+
+def connect():
+    post_save.connect(
+        invalidate_translation_cache, sender=models.ConsentSourceTranslation
+    )
+    post_delete.connect(
+        invalidate_translation_cache, sender=models.ConsentSourceTranslation
+    )
+    post_save.connect(refresh_source_recipients, sender=models.ConsentSource)
+    post_save.connect(invalidate_source_cache, sender=models.ConsentSource)
+    post_delete.connect(invalidate_source_cache, sender=models.ConsentSource)
+    post_save.connect(refresh_consent_recipient, sender=models.UserConsent)
+    post_save.connect(refresh_optout_recipients, sender=models.EmailOptOut)
+    post_delete.connect(refresh_optout_recipients, sender=models.EmailOptOut)
+    post_save.connect(refresh_user_recipients, sender=get_user_model())
@@ -0,0 +1,134 @@
+"""
+An in-memory index of everyone who opted out of all emails, used by
+:class:`~django_consent.backends.ConsentEmailBackend` to check recipients
+without querying the database for every message.
+"""
+import bisect
+import threading
+import time
+from array import array
+from email.utils import parseaddr
+
+from . import models
+from . import settings as consent_settings
+from . import utils
+
+_MASK = (1 << 64) - 1
+
+
+class SuppressionIndex:
+    """
+    Holds the email hashes of opt-outs from everything as a sorted array of
+    128 bit integers, split in two arrays of 64 bit halves. This takes 16 bytes
+    per opt-out, and lookups are binary searches.
+
+    :meth:`refresh` only reads opt-outs modified since the previous refresh.
+    Since deleted opt-outs (undone by the user) can't be seen that way, the
+    whole index is rebuilt every ``rebuild_interval`` seconds.
+    """
+
+    def __init__(self, refresh_interval=60, rebuild_interval=3600):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        # The high and low halves of the hashes, replaced together
+        self._arrays = (array("Q"), array("Q"))
+        # Hashes added since the arrays were built
+        self._recent = set()
+        self._last_modified = None
+        self._refreshed = None
+        self._rebuilt = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._arrays[0]) + len(self._recent)
+
+    def _get_optouts(self):
+        return models.EmailOptOut.objects.filter(is_everything=True).order_by()
+
+    def _build(self, hashes):
+        values = sorted(hashes)
+        self._arrays = (
+            array("Q", (v >> 64 for v in values)),
+            array("Q", (v & _MASK for v in values)),
+        )
+        self._recent = set()
+
+    def rebuild(self):
+        with self._lock:
+            now = time.monotonic()
+            optouts = self._get_optouts()
+            last_modified = optouts.values_list("modified", flat=True).order_by(
+                "-modified"
+            )[:1]
+            self._last_modified = last_modified[0] if last_modified else None
+            self._build(
+                email_hash.int
+                for email_hash in optouts.values_list(
+                    "email_hash", flat=True
+                ).iterator()
+            )
+            self._refreshed = self._rebuilt = now
+
+    def refresh(self, force=False):
+        """
+        Reads new opt-outs if the index is older than ``refresh_interval``.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._rebuilt is None or now - self._rebuilt > self.rebuild_interval:
+                self.rebuild()
+                return
+            if not force and now - self._refreshed < self.refresh_interval:
+                return
+            optouts = self._get_optouts()
+            if self._last_modified:
+                optouts = optouts.filter(modified__gte=self._last_modified)
+            for email_hash, modified in optouts.values_list("email_hash", "modified"):
+                self._recent.add(email_hash.int)
+                if self._last_modified is None or modified > self._last_modified:
+                    self._last_modified = modified
+            if len(self._recent) > 10000:
+                self._build(self._iter_hashes())
+            self._refreshed = now
+
+    def _iter_hashes(self):
+        for high, low in zip(*self._arrays):
+            yield high << 64 | low
+        yield from self._recent
+
+    def contains_hash(self, email_hash):
+        value = email_hash.int
+        if value in self._recent:
+            return True
+        high, low = self._arrays
+        high_value = value >> 64
+        i = bisect.bisect_left(high, high_value)
+        while i < len(high) and high[i] == high_value:
+            if low[i] == value & _MASK:
+                return True
+            i += 1
+        return False
+
+    def __contains__(self, address):
+        """
+        Tells whether an address like ``"Name <email>"`` or ``"email"`` has
+        opted out of everything
+        """
+        return self.contains_hash(utils.get_email_hash(parseaddr(address)[1]))
+
+
+_index = None
+
+
+def get_index():
+    """
+    Returns the index of the current process, refreshed if it's outdated
+    """
+    global _index
+    if _index is None:
+        _index = SuppressionIndex(
+            refresh_interval=consent_settings.SUPPRESSION_REFRESH_INTERVAL,
+            rebuild_interval=consent_settings.SUPPRESSION_REBUILD_INTERVAL,
+        )
+    _index.refresh()
+    return _index
@@ -0,0 +1,195 @@
+"""
+Rate limiting of the consent views, configured with
+``settings.CONSENT_RATELIMIT``.
+
+This is either a rate like ``"100/h"`` or a dict with the ``rate`` and options
+of the limiter::
+
+    CONSENT_RATELIMIT = {
+        "rate": "100/h",
+        "backend": "django_consent.throttling.TwoTierRateLimiter",
+        "block": False,
+        "cache": "default",
+        "max_keys": 10000,
+        "sync_threshold": 0.5,
+    }
+
+Like the ``ratelimit`` decorator of django-ratelimit, requests over the limit
+get ``request.limited = True``, and are only refused when ``block`` is true.
+"""
+import re
+import time
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from ratelimit.core import ip_mask
+from ratelimit.core import is_ratelimited
+from ratelimit.exceptions import Ratelimited
+
+from . import settings as consent_settings
+
+_PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+DEFAULT_BACKEND = "django_consent.throttling.TwoTierRateLimiter"
+
+
+def parse_rate(rate):
+    """
+    Returns the number of requests and the seconds of a rate like ``"100/h"``
+    or ``"10/5m"``
+    """
+    match = re.fullmatch(r"(\d+)/(\d*)([smhd])", rate)
+    if not match:
+        raise ValueError("Invalid rate: {}".format(rate))
+    count, multiplier, period = match.groups()
+    return int(count), int(multiplier or 1) * _PERIODS[period]
+
+
+def get_key(request):
+    return ip_mask(request.META["REMOTE_ADDR"])
+
+
+class CacheRateLimiter:
+    """
+    Counts every request in the cache with django-ratelimit
+    """
+
+    def __init__(self, rate, **options):
+        self.rate = rate
+
+    def is_limited(self, request, group):
+        return is_ratelimited(
+            request, group=group, key="ip", rate=self.rate, increment=True
+        )
+
+
+class _Counter:
+    __slots__ = ("window", "pending", "shared", "previous", "previous_synced")
+
+    def __init__(self, window):
+        self.window = window
+        # Requests not yet added to the shared cache
+        self.pending = 0
+        # Requests of all processes in the current window, as of the last sync
+        self.shared = 0
+        self.previous = 0
+        self.previous_synced = False
+
+    def advance(self, window):
+        if window != self.window:
+            self.previous = (
+                self.shared + self.pending if window == self.window + 1 else 0
+            )
+            self.window = window
+            self.pending = self.shared = 0
+            self.previous_synced = False
+
+    def estimate(self, weight):
+        # A sliding window, assuming requests of the previous window were
+        # spread evenly
+        return self.shared + self.pending + self.previous * weight
+
+
+class TwoTierRateLimiter:
+    """
+    Counts requests in the memory of each process, and only adds them to the
+    shared cache once a key has used ``sync_threshold`` of its limit. Normal
+    traffic therefore doesn't cause any cache requests.
+
+    The counters aren't locked, and at most ``max_keys`` are kept, so counts
+    are approximate: Concurrent requests may be counted once, and each process
+    can let through up to ``sync_threshold`` of the limit before it checks the
+    totals of other processes.
+    """
+
+    def __init__(
+        self, rate, cache="default", max_keys=10000, sync_threshold=0.5, **options
+    ):
+        self.limit, self.period = parse_rate(rate)
+        self.cache = cache
+        self.max_keys = max_keys
+        self.sync_threshold = sync_threshold
+        self._counters = {}
+
+    def _evict(self, window):
+        for key in list(self._counters):
+            counter = self._counters.get(key)
+            if counter is not None and counter.window < window - 1:
+                self._counters.pop(key, None)
+        excess = len(self._counters) - self.max_keys
+        if excess > 0:
+            # The oldest keys, since dicts keep their insertion order
+            for key in list(self._counters)[:excess]:
+                self._counters.pop(key, None)
+
+    def _shared_key(self, key, window):
+        return "consent-ratelimit:{}:{}:{}".format(key[0], key[1], window)
+
+    def _sync(self, key, counter):
+        cache = caches[self.cache]
+        window_key = self._shared_key(key, counter.window)
+        pending, counter.pending = counter.pending, 0
+        # Sent as one increment, however many requests were counted locally
+        if cache.add(window_key, pending, self.period * 2):
+            counter.shared = pending
+        else:
+            try:
+                counter.shared = cache.incr(window_key, pending)
+            except ValueError:
+                # Expired since add()
+                cache.set(window_key, pending, self.period * 2)
+                counter.shared = pending
+        if not counter.previous_synced:
+            previous = cache.get(self._shared_key(key, counter.window - 1))
+            counter.previous = max(counter.previous, previous or 0)
+            counter.previous_synced = True
+
+    def is_limited(self, request, group):
+        key = (group, get_key(request))
+        window, elapsed = divmod(time.time(), self.period)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, _Counter(window))
+            if len(self._counters) > self.max_keys:
+                self._evict(window)
+        counter.advance(window)
+        counter.pending += 1
+
+        weight = 1 - elapsed / self.period
+        if counter.estimate(weight) >= self.limit * self.sync_threshold:
+            self._sync(key, counter)
+        return counter.estimate(weight) > self.limit
+
+
+def get_config():
+    config = consent_settings.RATELIMIT
+    if isinstance(config, str):
+        config = {"rate": config}
+    return config
+
+
+_limiter = None
+
+
+def get_limiter():
+    """
+    Returns the rate limiter of the current process
+    """
+    global _limiter
+    if _limiter is None:
+        config = get_config()
+        backend = import_string(config.get("backend", DEFAULT_BACKEND))
+        _limiter = backend(**config)
+    return _limiter
+
+
+def check_ratelimit(request, group):
+    """
+    Counts a request and sets ``request.limited``. Raises
+    :class:`ratelimit.exceptions.Ratelimited` if it's over the limit and the
+    limiter is configured to block.
+    """
+    limited = get_limiter().is_limited(request, group)
+    request.limited = limited or getattr(request, "limited", False)
+    if limited and get_config().get("block", False):
+        raise Ratelimited()
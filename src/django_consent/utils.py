@@ -1,6 +1,18 @@
+import base64
+import binascii
+import concurrent.futures
+import functools
+import hashlib
+import hmac
+import itertools
+import struct
 import uuid
+from email.utils import parseaddr
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core import signing
+from django.utils.encoding import force_bytes
 
 from . import settings as consent_settings
 
@@ -9,12 +21,223 @@ def get_email_hash(email):
     return uuid.uuid3(uuid.NAMESPACE_URL, email)
 
 
+def normalize_email(email):
+    """
+    Returns the address of an email like ``" Name <email> "``, or an empty
+    string if it isn't an email. The case is kept, since hashes of consent and
+    opt-outs are made from emails as they were entered.
+    """
+    email = parseaddr(email.strip())[1]
+    return email if "@" in email else ""
+
+
+def get_email_hashes(emails):
+    """
+    Returns the hashes of a list of emails after normalizing them, skipping
+    anything that isn't an email. Used for importing large lists, possibly in
+    several processes.
+    """
+    hashes = []
+    for email in emails:
+        email = normalize_email(email)
+        if email:
+            hashes.append(get_email_hash(email))
+    return hashes
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of at most ``size`` items from ``iterable`` without reading
+    more of it than necessary.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Recipient:
+    """
+    A compact record of someone to email, yielded by :func:`iter_recipients`
+    instead of full model instances.
+    """
+
+    __slots__ = ("email", "consent_id", "email_hash", "name")
+
+    def __init__(self, email, consent_id, email_hash, name=""):
+        self.email = email
+        self.consent_id = consent_id
+        self.email_hash = email_hash
+        self.name = name
+
+    def __repr__(self):
+        return "<Recipient {} ({})>".format(self.consent_id, self.email_hash)
+
+    @property
+    def id(self):
+        # Makes recipients work as consent when creating tokens
+        return self.consent_id
+
+
+def iter_recipients(consents, chunk_size=2000):
+    """
+    Yields a :class:`Recipient` for each row in a UserConsent queryset.
+
+    Rows are read in chunks ordered by primary key, each chunk continuing after
+    the last key of the previous one. Memory use thus stays flat and the number
+    of queries is the number of chunks, no matter how many rows there are.
+    """
+    User = get_user_model()
+    user_fields = [User.EMAIL_FIELD] + [
+        f.name for f in User._meta.get_fields() if f.name in ("first_name", "last_name")
+    ]
+    consents = consents.order_by("id").values_list(
+        "id", "email_hash", *["user__" + f for f in user_fields]
+    )
+    last_id = None
+    while True:
+        chunk = consents if last_id is None else consents.filter(id__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        for consent_id, email_hash, email, *names in chunk:
+            yield Recipient(
+                email, consent_id, email_hash, " ".join(filter(None, names))
+            )
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+#: First byte of tokens in the current format
+TOKEN_VERSION = 1
+
+# Version, key id, email hash and MAC: 34 bytes encoded without padding
+TOKEN_LENGTH = 46
+
+
+@functools.lru_cache(maxsize=None)
+def get_token_keys(keys):
+    """
+    Returns ``(key id, prepared HMAC)`` tuples for a tuple of secret keys. The
+    key id is derived from the key itself, so tokens remain valid when keys are
+    reordered.
+    """
+    prepared = []
+    for key in keys:
+        derived = hashlib.sha256(b"django-consent-token:" + force_bytes(key)).digest()
+        key_id = hashlib.sha256(derived).digest()[0]
+        prepared.append((key_id, hmac.new(derived, digestmod=hashlib.sha256)))
+    return prepared
+
+
+def _get_keys():
+    return tuple(consent_settings.TOKEN_KEYS or [settings.SECRET_KEY])
+
+
+def _get_mac(prepared, consent_id, email_hash_bytes, salt):
+    mac = prepared.copy()
+    mac.update(struct.pack(">Q", consent_id) + email_hash_bytes + force_bytes(salt))
+    return mac.digest()[:16]
+
+
+def _as_uuid(email_hash):
+    return email_hash if isinstance(email_hash, uuid.UUID) else uuid.UUID(email_hash)
+
+
+def make_token(consent_id, email_hash, salt, keys=None):
+    """
+    Returns a token for a consent ID and email hash, signed with the first of
+    ``settings.CONSENT_TOKEN_KEYS``.
+
+    The token contains the email hash and an HMAC of the consent ID, the email
+    hash and the salt. It always has the same length.
+    """
+    key_id, prepared = get_token_keys(keys or _get_keys())[0]
+    email_hash_bytes = _as_uuid(email_hash).bytes
+    raw = (
+        bytes([TOKEN_VERSION, key_id])
+        + email_hash_bytes
+        + _get_mac(prepared, consent_id, email_hash_bytes, salt)
+    )
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _make_tokens(pairs, salt, keys):
+    return [
+        make_token(consent_id, email_hash, salt, keys)
+        for consent_id, email_hash in pairs
+    ]
+
+
 def get_consent_token(consent, salt=consent_settings.UNSUBSCRIBE_SALT):
     """
     Returns a token (for a URL) which can be validated to unsubscribe from the
     supplied consent object.
     """
-    return signing.dumps(str(consent.email_hash) + "," + str(consent.id), salt=salt)
+    return make_token(consent.id, consent.email_hash, salt)
+
+
+def get_consent_tokens(
+    consents, salt=consent_settings.UNSUBSCRIBE_SALT, processes=None
+):
+    """
+    Returns a list of tokens for many consents, or
+    :class:`Recipient` objects, reusing the prepared key.
+
+    :param: processes: Spread the work over this many processes, which only
+    pays off for very large lists.
+    """
+    pairs = [(consent.id, consent.email_hash) for consent in consents]
+    keys = _get_keys()
+    if not processes or processes < 2:
+        return _make_tokens(pairs, salt, keys)
+    chunk_size = max(1, len(pairs) // (processes * 4))
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        chunks = executor.map(
+            _make_tokens,
+            chunked(pairs, chunk_size),
+            itertools.repeat(salt),
+            itertools.repeat(keys),
+        )
+        return list(itertools.chain.from_iterable(chunks))
+
+
+def _get_legacy_token_email_hash(token, consent_id, salt):
+    try:
+        value = signing.loads(token, salt=salt).split(",")
+        if value[1] == str(consent_id):
+            return uuid.UUID(value[0])
+    except (signing.BadSignature, IndexError, ValueError):
+        pass
+    return None
+
+
+def get_token_email_hash(token, consent_id, salt=consent_settings.UNSUBSCRIBE_SALT):
+    """
+    Returns the email hash contained in a valid token for the consent ID, or
+    ``None`` if the token isn't valid. This doesn't need the database.
+
+    Tokens created with ``django.core.signing`` by earlier versions are still
+    accepted.
+    """
+    if ":" in token:
+        return _get_legacy_token_email_hash(token, consent_id, salt)
+    if len(token) != TOKEN_LENGTH:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "==")
+    except (ValueError, binascii.Error):
+        return None
+    if raw[0] != TOKEN_VERSION:
+        return None
+    email_hash_bytes = raw[2:18]
+    for key_id, prepared in get_token_keys(_get_keys()):
+        if key_id == raw[1] and hmac.compare_digest(
+            _get_mac(prepared, int(consent_id), email_hash_bytes, salt), raw[18:]
+        ):
+            return uuid.UUID(bytes=email_hash_bytes)
+    return None
 
 
 def validate_token(token, consent, salt=consent_settings.UNSUBSCRIBE_SALT):
@@ -22,8 +245,5 @@ def validate_token(token, consent, salt=consent_settings.UNSUBSCRIBE_SALT):
     Returns true/false according to whether the token validates for the consent
     object
     """
-    try:
-        value = signing.loads(token, salt=salt).split(",")
-        return value[0] == str(consent.email_hash) and value[1] == str(consent.id)
-    except (signing.BadSignature, IndexError):
-        return False
+    email_hash = get_token_email_hash(token, consent.id, salt=salt)
+    return email_hash is not None and email_hash == _as_uuid(consent.email_hash)
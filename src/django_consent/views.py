@@ -1,20 +1,38 @@
+from django.db.models import Exists
+from django.db.models import OuterRef
 from django.http.response import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from django.utils.decorators import method_decorator
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.views.generic.base import TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView
-from ratelimit.decorators import ratelimit
 
 from . import forms
 from . import models
 from . import settings as consent_settings
+from . import throttling
 from . import utils
-from .settings import RATELIMIT
 
 
-class ConsentCreateView(CreateView):
+class RateLimitMixin:
+    """
+    Counts requests against ``settings.CONSENT_RATELIMIT``, see
+    :mod:`django_consent.throttling`
+    """
+
+    ratelimit_group = "consent"
+
+    def check_ratelimit(self, request):
+        throttling.check_ratelimit(request, self.ratelimit_group)
+
+    def dispatch(self, request, *args, **kwargs):
+        self.check_ratelimit(request)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ConsentCreateView(RateLimitMixin, CreateView):
     """
     The view isn't part of urls.py but you can add it to your own project's
     url configuration if you want to use it.
@@ -27,13 +45,12 @@ class ConsentCreateView(CreateView):
     model = models.UserConsent
     form_class = forms.EmailConsentForm
     template_name = "consent/user/create.html"
+    ratelimit_group = "consent-signup"
 
-    @method_decorator(ratelimit(key="ip", rate=RATELIMIT))
-    def dispatch(self, request, *args, **kwargs):
-        self.consent_source = get_object_or_404(
-            models.ConsentSource, id=kwargs["source_id"]
-        )
-        return super().dispatch(request, *args, **kwargs)
+    @cached_property
+    def consent_source(self):
+        # Looked up by the handler, after the rate limit was checked
+        return get_object_or_404(models.ConsentSource, id=self.kwargs["source_id"])
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -61,41 +78,89 @@ class ConsentCreateView(CreateView):
         )
 
 
-class UserConsentActionView(DetailView):
+class UserConsentActionView(RateLimitMixin, DetailView):
     """
     An abstract view
 
-    Validates that a token is valid for consent ID + email_hash
+    Validates that a token is valid for consent ID + email_hash before the
+    database is touched, so links with invalid tokens don't cost any queries.
     """
 
     model = models.UserConsent
     context_object_name = "consent"
     token_salt = consent_settings.UNSUBSCRIBE_SALT
+    ratelimit_group = "consent-link"
 
-    @method_decorator(ratelimit(key="ip", rate=RATELIMIT))
-    def dispatch(self, *args, **kwargs):
-        return super().dispatch(*args, **kwargs)
-
-    def action(self, consent):
+    def action(self, queryset):
+        """
+        Carries out the action on ``queryset``, which only contains the consent
+        of the link, and returns the consent or ``None`` if it doesn't exist.
+        """
         raise NotImplementedError("blah")
 
+    def get_queryset(self):
+        # The templates show the email of the user
+        return super().get_queryset().select_related("user")
+
+    def get_consent(self, queryset):
+        try:
+            return queryset.get()
+        except self.model.DoesNotExist:
+            return None
+
     def get_object(self, queryset=None):
-        consent = super().get_object(queryset)
-        token = self.kwargs.get("token")
+        if queryset is None:
+            queryset = self.get_queryset()
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        email_hash = utils.get_token_email_hash(
+            self.kwargs.get("token"), pk, salt=self.token_salt
+        )
+        if email_hash is None:
+            raise Http404("This does not work")
 
-        if utils.validate_token(token, consent, salt=self.token_salt):
-            self.action(consent)
-            return consent
-        else:
+        consent = self.action(queryset.filter(pk=pk, email_hash=email_hash))
+        if consent is None:
             raise Http404("This does not work")
+        return consent
 
     def get_context_data(self, **kwargs):
         c = super().get_context_data(**kwargs)
-        c["token"] = utils.get_consent_token(c["consent"], salt=self.token_salt)
+        # The token was validated for the same consent and salt
+        c["token"] = self.kwargs["token"]
         return c
 
 
-class ConsentWithdrawView(UserConsentActionView):
+class ConsentOptOutMixin:
+    """
+    Creates an opt-out for the consent unless an identical one exists, which is
+    checked in the same query that loads the consent.
+    """
+
+    is_everything = False
+
+    def action(self, queryset):
+        consent = self.get_consent(
+            queryset.annotate(
+                opted_out=Exists(
+                    # Not by user, which is NULL if the user was deleted
+                    models.EmailOptOut.objects.filter(
+                        consent=OuterRef("pk"), is_everything=self.is_everything
+                    )
+                )
+            )
+        )
+        if consent is not None and not consent.opted_out:
+            models.EmailOptOut.objects.create(
+                user_id=consent.user_id,
+                consent=consent,
+                email_hash=consent.email_hash,
+                is_everything=self.is_everything,
+            )
+            models.ConsentStatistics.objects.increment(consent.source_id, optouts=1)
+        return consent
+
+
+class ConsentWithdrawView(ConsentOptOutMixin, UserConsentActionView):
     """
     Withdraws a consent. In the case of a newsletter, it unsubscribes a user
     from receiving the newsletter.
@@ -108,9 +173,6 @@ class ConsentWithdrawView(UserConsentActionView):
     context_object_name = "consent"
     token_salt = consent_settings.UNSUBSCRIBE_SALT
 
-    def action(self, consent):
-        consent.optout()
-
 
 class ConsentWithdrawUndoView(UserConsentActionView):
     """
@@ -123,11 +185,20 @@ class ConsentWithdrawUndoView(UserConsentActionView):
     template_name = "consent/user/unsubscribe/undo.html"
     token_salt = consent_settings.UNSUBSCRIBE_SALT
 
-    def action(self, consent):
-        consent.optouts.all().delete()
+    def get_optouts(self, queryset):
+        return models.EmailOptOut.objects.filter(consent__in=queryset.values("pk"))
 
+    def action(self, queryset):
+        deleted, __ = self.get_optouts(queryset).delete()
+        consent = self.get_consent(queryset)
+        if consent is not None:
+            models.ConsentStatistics.objects.increment(
+                consent.source_id, optouts_undone=deleted
+            )
+        return consent
 
-class ConsentWithdrawAllView(UserConsentActionView):
+
+class ConsentWithdrawAllView(ConsentOptOutMixin, UserConsentActionView):
     """
     Withdraws a consent. In the case of a newsletter, it unsubscribes a user
     from receiving the newsletter.
@@ -139,12 +210,10 @@ class ConsentWithdrawAllView(UserConsentActionView):
     model = models.UserConsent
     context_object_name = "consent"
     token_salt = consent_settings.UNSUBSCRIBE_ALL_SALT
-
-    def action(self, consent):
-        consent.optout(is_everything=True)
+    is_everything = True
 
 
-class ConsentWithdrawAllUndoView(UserConsentActionView):
+class ConsentWithdrawAllUndoView(ConsentWithdrawUndoView):
     """
     This is related to undoing withdrawal of consent in case that the user
     clicked the wrong link.
@@ -158,8 +227,8 @@ class ConsentWithdrawAllUndoView(UserConsentActionView):
     template_name = "consent/user/unsubscribe_all/undo.html"
     token_salt = consent_settings.UNSUBSCRIBE_ALL_SALT
 
-    def action(self, consent):
-        consent.optouts.filter(is_everything=True).delete()
+    def get_optouts(self, queryset):
+        return super().get_optouts(queryset).filter(is_everything=True)
 
 
 class ConsentConfirmationReceiveView(UserConsentActionView):
@@ -171,11 +240,22 @@ class ConsentConfirmationReceiveView(UserConsentActionView):
     template_name = "consent/user/confirmation_received.html"
     token_salt = consent_settings.CONFIRM_SALT
 
-    def action(self, consent):
-        consent.confirm()
-
-
-class ConsentConfirmationSentView(TemplateView):
+    def action(self, queryset):
+        confirmed = queryset.filter(email_confirmed=False).update(
+            email_confirmed=True, modified=timezone.now()
+        )
+        # update() doesn't send post_save
+        if confirmed and consent_settings.MATERIALIZE_RECIPIENTS:
+            models.ConsentRecipient.objects.refresh(queryset)
+        consent = self.get_consent(queryset)
+        if confirmed and consent is not None:
+            models.ConsentStatistics.objects.increment(
+                consent.source_id, confirmations=1
+            )
+        return consent
+
+
+class ConsentConfirmationSentView(RateLimitMixin, TemplateView):
     """
     Informs a user that their confirmation has been sent
     """
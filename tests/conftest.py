@@ -1,5 +1,6 @@
 # Needed for fixtures to be visible in all test_* modules
 from .fixtures import base_consent  # noqa
+from .fixtures import clear_caches  # noqa
 from .fixtures import create_user  # noqa
 from .fixtures import many_consents  # noqa
 from .fixtures import many_consents_per_user  # noqa
@@ -4,7 +4,11 @@ import uuid
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache
+from django_consent import metrics
 from django_consent import models
+from django_consent import suppression
+from django_consent import throttling
 
 
 def get_random_string(length):
@@ -21,6 +25,25 @@ def get_random_email():
     )
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Per-process caches would otherwise outlive the database rows of a test
+    """
+    models.translation_cache.clear()
+    models.source_cache.clear()
+    suppression._index = None
+    throttling._limiter = None
+    metrics._sink = None
+    yield
+    models.translation_cache.clear()
+    models.source_cache.clear()
+    suppression._index = None
+    throttling._limiter = None
+    metrics._sink = None
+    cache.clear()
+
+
 @pytest.fixture
 def base_consent():
     """Pytest fixture.
@@ -26,6 +26,13 @@ TEMPLATES = [
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "APP_DIRS": True,
         "DIRS": ["path/to/your/templates"],
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
     },
 ]
 
@@ -52,3 +59,5 @@ LANGUAGES = [
     ("en", _("English")),
     ("hi", _("Hindi")),
 ]
+
+STATIC_URL = "/static/"
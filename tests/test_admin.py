@@ -0,0 +1,147 @@
+import pytest
+from django.db import connection
+from django.db import IntegrityError
+from django.db.models.sql.compiler import SQLCompiler
+from django.urls import reverse
+from django_consent import admin
+from django_consent import models
+from django_consent import settings as consent_settings
+
+
+@pytest.fixture
+def opted_out(user_consent):
+    consents = list(user_consent["base_consent"].get_valid_consent()[:3])
+    for consent in consents:
+        consent.optout()
+    return consents
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "model",
+    [
+        models.ConsentSource,
+        models.UserConsent,
+        models.EmailOptOut,
+        models.EmailCampaign,
+        models.ConsentRecipient,
+        models.OutgoingEmail,
+    ],
+)
+def test_changelists(admin_client, opted_out, model):
+    url = reverse("admin:django_consent_{}_changelist".format(model._meta.model_name))
+    assert admin_client.get(url).status_code == 200
+
+
+@pytest.mark.django_db
+def test_source_counts(admin_client, opted_out, django_assert_num_queries):
+    source = opted_out[0].source
+    counts = models.UserConsent.objects.count_by_source()[source.id]
+    assert counts["total"] == source.consents.count()
+    assert counts["valid"] == source.get_valid_consent().count()
+    assert counts["opted_out"] == 3
+
+    admin.source_counts.clear()
+    url = reverse("admin:django_consent_consentsource_changelist")
+    response = admin_client.get(url)
+    assert response.context["cl"].result_list[0].pk == source.pk
+    # Counts are cached
+    with django_assert_num_queries(0):
+        admin.ConsentSourceAdmin(models.ConsentSource, None).get_counts()
+
+
+@pytest.mark.django_db
+def test_search_by_email(admin_client, opted_out):
+    consent = opted_out[0]
+    url = reverse("admin:django_consent_userconsent_changelist")
+    response = admin_client.get(url, {"q": consent.email})
+    assert list(response.context["cl"].result_list) == [consent]
+    response = admin_client.get(url, {"q": str(consent.id)})
+    assert list(response.context["cl"].result_list) == [consent]
+
+
+@pytest.mark.django_db
+def test_consent_actions(user_consent, django_assert_num_queries):
+    source = user_consent["base_consent"]
+    unconfirmed = source.consents.filter(email_confirmed=False)
+    ids = list(unconfirmed.values_list("id", flat=True))
+    assert ids
+
+    # One query besides the savepoint
+    with django_assert_num_queries(3):
+        assert models.UserConsent.objects.filter(id__in=ids).confirm() == len(ids)
+    assert not source.consents.filter(email_confirmed=False).exists()
+
+    models.UserConsent.objects.get(id=ids[0]).optout()
+    with django_assert_num_queries(3):
+        assert models.UserConsent.objects.filter(id__in=ids).optout() == len(ids) - 1
+    assert models.EmailOptOut.objects.filter(consent_id__in=ids).count() == len(ids)
+    assert not models.UserConsent.objects.filter(id__in=ids).valid().exists()
+    optout = models.EmailOptOut.objects.get(consent_id=ids[1])
+    assert not optout.is_everything
+    assert optout.email_hash == optout.consent.email_hash
+    assert optout.user == optout.consent.user
+    assert optout.created is not None
+
+
+@pytest.mark.django_db
+def test_optout_without_user(user_consent):
+    consent = models.UserConsent.objects.first()
+    consent.user.delete()
+    consents = models.UserConsent.objects.filter(pk=consent.pk)
+    assert consents.optout() == 1
+    assert consents.optout() == 0
+    optout = models.EmailOptOut.objects.get(consent=consent)
+    assert optout.user is None
+    assert optout.email_hash == consent.email_hash
+
+
+@pytest.mark.django_db
+def test_optout_unexpected_columns(user_consent, monkeypatch):
+    as_sql = SQLCompiler.as_sql
+
+    def reordered_as_sql(self, *args, **kwargs):
+        result = as_sql(self, *args, **kwargs)
+        self.select = self.select[::-1]
+        return result
+
+    monkeypatch.setattr(SQLCompiler, "as_sql", reordered_as_sql)
+    with pytest.raises(RuntimeError):
+        models.UserConsent.objects.optout()
+    monkeypatch.undo()
+    assert not models.EmailOptOut.objects.exists()
+
+
+@pytest.mark.django_db
+def test_consent_actions_statistics(user_consent, monkeypatch):
+    monkeypatch.setattr(consent_settings, "STATISTICS", True)
+    source = user_consent["base_consent"]
+    consents = source.consents.all()
+    unconfirmed = consents.filter(email_confirmed=False).count()
+    statistics = models.ConsentStatistics.objects
+
+    # Only the rows that were changed are counted, also when the queryset
+    # no longer matches them afterwards
+    assert consents.filter(email_confirmed=False).confirm() == unconfirmed
+    assert consents.confirm() == 0
+    assert statistics.totals(source=source)["confirmations"] == unconfirmed
+
+    consents.first().optout()
+    optouts = statistics.totals(source=source)["optouts"]
+    assert consents.valid().optout() == consents.count() - 1
+    assert consents.optout() == 0
+    assert statistics.totals(source=source)["optouts"] == consents.count()
+    assert optouts == 1
+
+    # Nothing is counted when the INSERT fails
+    models.EmailOptOut.objects.all().delete()
+
+    def fail_insert(execute, sql, params, many, context):
+        if sql.startswith("INSERT INTO"):
+            raise IntegrityError
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(fail_insert):
+        with pytest.raises(IntegrityError):
+            consents.optout()
+    assert statistics.totals(source=source)["optouts"] == consents.count()
@@ -0,0 +1,92 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from django.utils.http import urlencode
+from django_consent import models
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+from .fixtures import get_random_email
+
+
+def request(method, url, **kwargs):
+    async def make_request():
+        return await getattr(AsyncClient(), method)(url, **kwargs)
+
+    return async_to_sync(make_request)()
+
+
+def get(url):
+    return request("get", url)
+
+
+def post(url, data):
+    return request(
+        "post",
+        url,
+        data=urlencode(data),
+        content_type="application/x-www-form-urlencoded",
+    )
+
+
+@pytest.mark.django_db
+def test_async_signup(user_consent):
+    source = user_consent["base_consent"]
+    url = reverse("signup_async", kwargs={"source_id": source.id})
+
+    response = get(url)
+    assert response.status_code == 200
+    assert b"<form" in response.content
+
+    data = {"email": get_random_email(), "confirmation": True}
+    response = post(url, data=data)
+    assert response.status_code == 302
+    assert not models.UserConsent.objects.get(
+        user__email=data["email"], source=source
+    ).email_confirmed
+
+    assert get(reverse("signup_async", kwargs={"source_id": 0})).status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_unsubscribe(user_consent):
+    consent = user_consent["base_consent"].consents.order_by("?")[0]
+    consent.confirm()
+    kwargs = {
+        "pk": consent.id,
+        "token": utils.get_consent_token(
+            consent, salt=consent_settings.UNSUBSCRIBE_SALT
+        ),
+    }
+
+    response = get(reverse("consent_async:unsubscribe", kwargs=kwargs))
+    assert response.status_code == 200
+    assert not models.UserConsent.objects.get(id=consent.id).is_valid()
+    assert (
+        reverse("consent_async:unsubscribe_undo", kwargs=kwargs)
+        in response.content.decode()
+    )
+
+    response = get(reverse("consent_async:unsubscribe_undo", kwargs=kwargs))
+    assert response.status_code == 200
+    assert models.UserConsent.objects.get(id=consent.id).is_valid()
+
+    kwargs["token"] = "invalid"
+    response = get(reverse("consent_async:unsubscribe", kwargs=kwargs))
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_async_confirm(user_consent):
+    consent = user_consent["base_consent"].consents.filter(email_confirmed=False)[0]
+    url = reverse(
+        "consent_async:consent_confirm",
+        kwargs={"pk": consent.id, "token": consent.confirm_token},
+    )
+    response = get(url)
+    assert response.status_code == 200
+    assert models.UserConsent.objects.get(id=consent.id).email_confirmed
+
+    response = request("put", url)
+    assert response.status_code == 405
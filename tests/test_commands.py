@@ -0,0 +1,157 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from django_consent import models
+from django_consent import settings as consent_settings
+
+from .fixtures import get_random_email
+
+
+@pytest.mark.django_db
+def test_import_emails(base_consent, tmp_path):
+    emails = [get_random_email() for __ in range(25)]
+    path = tmp_path / "emails.txt"
+    path.write_text("\n".join(emails[:10] + [""] + emails[10:]) + "\n")
+    checkpoint = tmp_path / "checkpoint"
+
+    call_command(
+        "consent_import_emails",
+        base_consent.id,
+        str(path),
+        batch_size=10,
+        checkpoint=str(checkpoint),
+    )
+    assert base_consent.consents.count() == 25
+    assert base_consent.get_valid_consent().count() == 25
+    assert checkpoint.read_text() == "26"
+
+    # Resuming a finished import does nothing
+    with path.open("a") as f:
+        f.write(get_random_email() + "\n")
+    call_command(
+        "consent_import_emails",
+        base_consent.id,
+        str(path),
+        checkpoint=str(checkpoint),
+    )
+    assert base_consent.consents.count() == 26
+    assert models.UserConsent.objects.count() == 26
+
+
+@pytest.mark.django_db
+def test_import_optouts(user_consent, tmp_path):
+    consent = user_consent["base_consent"].get_valid_consent()[0]
+    emails = [get_random_email() for __ in range(20)]
+    path = tmp_path / "optouts.csv"
+    rows = ["name,email", "Existing, {} ".format(consent.email)]
+    rows += ["Person {},{}".format(i, email) for i, email in enumerate(emails)]
+    path.write_text(
+        "\n".join(rows + ["Duplicate,Person <{}>".format(emails[0]), "Nobody,"]) + "\n"
+    )
+    checkpoint = tmp_path / "checkpoint"
+
+    call_command(
+        "consent_import_optouts",
+        str(path),
+        column="email",
+        batch_size=5,
+        checkpoint=str(checkpoint),
+    )
+    assert models.EmailOptOut.objects.filter(is_everything=True).count() == 21
+    assert checkpoint.read_text() == "23"
+    assert not models.UserConsent.objects.filter(id=consent.id).valid().exists()
+
+    # Importing again doesn't create duplicates
+    call_command("consent_import_optouts", str(path), column="1", processes=2)
+    assert models.EmailOptOut.objects.count() == 21
+
+
+@pytest.mark.django_db
+def test_recipients(user_consent):
+    with pytest.raises(CommandError):
+        call_command("consent_recipients", verify=True)
+    call_command("consent_recipients", rebuild=True, verify=True)
+    assert models.ConsentRecipient.objects.count() == models.UserConsent.objects.count()
+
+
+@pytest.mark.django_db
+def test_send_campaign(many_consents_per_user):
+    campaign = models.EmailCampaign.objects.create(name="test")
+    campaign.consent.add(*many_consents_per_user["many_consents"])
+    with pytest.raises(CommandError):
+        call_command("consent_send_campaign", campaign.id, "django_consent.foo")
+    call_command(
+        "consent_send_campaign", campaign.id, "django_consent.emails.BaseEmail"
+    )
+    assert len(mail.outbox) == 60
+
+
+@pytest.mark.django_db
+def test_outbox_worker(user_consent):
+    for consent in models.UserConsent.objects.all()[:5]:
+        models.OutgoingEmail.objects.create(
+            consent=consent, email_type=models.OutgoingEmail.CONFIRMATION
+        )
+    call_command("consent_outbox_worker", once=True, batch_size=2)
+    assert len(mail.outbox) == 5
+
+
+@pytest.mark.django_db
+def test_send_reminders(user_consent):
+    models.ConsentSource.objects.update(requires_confirmed_email=True)
+    models.UserConsent.objects.filter(email_confirmed=False).update(
+        email_confirmation_requested=timezone.now() - timedelta(days=30)
+    )
+    with pytest.raises(CommandError):
+        call_command("consent_send_reminders", rate="often")
+    call_command("consent_send_reminders", batch_size=3)
+    assert (
+        len(mail.outbox)
+        == models.UserConsent.objects.filter(email_confirmed=False).count()
+    )
+    assert len(mail.outbox) > 0
+
+
+@pytest.mark.django_db
+def test_purge(user_consent):
+    models.ConsentSource.objects.update(requires_confirmed_email=True)
+    long_ago = timezone.now() - timedelta(days=365)
+    models.UserConsent.objects.update(
+        created=long_ago, email_confirmation_requested=long_ago
+    )
+    unconfirmed = models.UserConsent.objects.filter(email_confirmed=False).count()
+    assert unconfirmed > 0
+
+    call_command("consent_purge", dry_run=True)
+    assert (
+        models.UserConsent.objects.filter(email_confirmed=False).count() == unconfirmed
+    )
+    call_command("consent_purge", chunk_size=3, sleep=0)
+    assert not models.UserConsent.objects.filter(email_confirmed=False).exists()
+    assert models.UserConsent.objects.exists()
+
+
+@pytest.mark.django_db
+def test_seed(monkeypatch):
+    monkeypatch.setattr(
+        consent_settings,
+        "SEED",
+        {"newsletter": {"source_name": "Newsletter", "definition": "News"}},
+    )
+    call_command("consent_seed")
+    call_command("consent_seed", "--update")
+    assert models.ConsentSource.objects.get(auto_create_id="newsletter")
+
+
+@pytest.mark.django_db
+def test_statistics(user_consent):
+    with pytest.raises(CommandError):
+        call_command("consent_statistics")
+    call_command("consent_statistics", "--rebuild")
+    source = user_consent["base_consent"]
+    assert models.ConsentStatistics.objects.totals(source=source)["signups"] == 20
+    call_command("consent_statistics", source=source.id)
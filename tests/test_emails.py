@@ -1,11 +1,27 @@
+from datetime import timedelta
+from unittest import mock
+
 import pytest
 from django.contrib.messages.storage.fallback import FallbackStorage
 from django.contrib.sites.models import Site
 from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail import get_connection
 from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.template import loader
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils import translation
 from django_consent import emails
 from django_consent import models
+from django_consent import sending
+from django_consent import settings as consent_settings
+from django_consent import suppression
+from django_consent import utils
+
+from .fixtures import get_random_email
 
 
 class FailBackend(BaseEmailBackend):
@@ -17,6 +33,28 @@ class FailBackend(BaseEmailBackend):
         raise RuntimeError("I blow up 🤯")
 
 
+class CountingBackend(LocmemBackend):
+    """
+    Counts how many times a connection is opened
+    """
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class LanguageEmail(emails.BaseEmail):
+    """
+    Remembers the language it was created in
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.language = translation.get_language()
+        super().__init__(*args, **kwargs)
+
+
 @pytest.mark.django_db
 def test_base(user_consent, rf):
     """
@@ -74,3 +112,306 @@ def test_confirm(user_consent):
 
     assert "Your confirmation is needed" in mail.outbox[-1].subject
     assert expected_url in mail.outbox[-1].body
+
+
+@pytest.mark.django_db
+def test_suppression_index(user_consent):
+    consents = list(models.UserConsent.objects.all()[:3])
+    consents[0].optout(is_everything=True)
+    consents[1].optout()
+    # An opt-out without a user, like after the user was deleted
+    deleted_email = "deleted@example.com"
+    models.EmailOptOut.objects.create(email_hash=utils.get_email_hash(deleted_email))
+
+    index = suppression.SuppressionIndex()
+    index.refresh()
+    assert len(index) == 2
+    assert consents[0].email in index
+    assert "Someone <{}>".format(deleted_email) in index
+    assert consents[1].email not in index
+    assert consents[2].email not in index
+
+    consents[2].optout(is_everything=True)
+    index.refresh()
+    assert consents[2].email not in index
+    index.refresh(force=True)
+    assert consents[2].email in index
+
+    # Undoing opt-outs is only noticed when rebuilding
+    consents[2].optouts.all().delete()
+    index.rebuild()
+    assert consents[2].email not in index
+
+
+@pytest.mark.django_db
+def test_consent_email_backend(user_consent, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(
+        consent_settings,
+        "EMAIL_BACKEND",
+        "django.core.mail.backends.locmem.EmailBackend",
+    )
+    opted_out, consent = models.UserConsent.objects.all()[:2]
+    opted_out.optout(is_everything=True)
+
+    connection = get_connection("django_consent.backends.ConsentEmailBackend")
+    messages = [
+        EmailMessage("Hi", "Body", to=[opted_out.email, consent.email]),
+        EmailMessage("Hi", "Body", to=[opted_out.email]),
+    ]
+    assert connection.send_messages(messages) == 1
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].to == [consent.email]
+
+    # The index is only read once in a while
+    with django_assert_num_queries(0):
+        connection.send_messages([EmailMessage("Hi", "Body", to=[consent.email])])
+    assert len(mail.outbox) == 2
+
+    # Confirmation emails are always sent
+    opted_out.email_confirmed = False
+    with override_settings(EMAIL_BACKEND="django_consent.backends.ConsentEmailBackend"):
+        emails.BaseEmail(user=opted_out.user).send()
+        assert len(mail.outbox) == 2
+        opted_out.email_confirmation(request=None)
+    assert len(mail.outbox) == 3
+
+
+@pytest.mark.django_db
+def test_send_campaign(many_consents_per_user):
+    campaign = models.EmailCampaign.objects.create(name="test")
+    campaign.consent.add(*many_consents_per_user["many_consents"][:2])
+    recipients = list(campaign.get_recipients())
+
+    progress = []
+    CountingBackend.opened = 0
+    sent = sending.send_campaign(
+        campaign,
+        emails.BaseEmail,
+        batch_size=15,
+        connection=CountingBackend(),
+        progress=lambda *args: progress.append(args),
+    )
+    assert sent == len(recipients) == 40
+    assert len(mail.outbox) == 40
+    assert CountingBackend.opened == 1
+    assert [p[0] for p in progress] == [15, 30, 40]
+    assert sorted(m.to[0] for m in mail.outbox) == sorted(c.email for c in recipients)
+
+
+@pytest.mark.django_db
+def test_outbox(user_consent, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(consent_settings, "EMAIL_OUTBOX", True)
+    consents = list(models.UserConsent.objects.filter(email_confirmed=False)[:3])
+    for consent in consents:
+        with django_assert_num_queries(1):
+            consent.email_confirmation(request=None)
+    assert len(mail.outbox) == 0
+    assert models.OutgoingEmail.objects.count() == 3
+
+    assert sending.send_outbox(batch_size=2, connection=FailBackend()) == (0, 2)
+    failed = models.OutgoingEmail.objects.filter(attempts=1)
+    assert failed.count() == 2
+    assert all(o.send_after > o.created and "blow up" in o.last_error for o in failed)
+
+    # Failed emails are retried later
+    assert sending.send_outbox() == (1, 0)
+    assert sending.send_outbox() == (0, 0)
+    assert len(mail.outbox) == 1
+    assert "Your confirmation is needed" in mail.outbox[0].subject
+
+    failed.update(send_after=timezone.now())
+    assert sending.send_outbox() == (2, 0)
+    assert len(mail.outbox) == 3
+    assert not models.OutgoingEmail.objects.filter(sent__isnull=True).exists()
+    for consent in consents:
+        consent.refresh_from_db()
+        assert consent.email_confirmation_requested
+
+
+@pytest.mark.django_db
+def test_outbox_claim(user_consent):
+    consent = models.UserConsent.objects.all()[0]
+    models.OutgoingEmail.objects.create(
+        consent=consent, email_type=models.OutgoingEmail.CONFIRMATION
+    )
+    claimed = models.OutgoingEmail.objects.claim()
+    assert len(claimed) == 1
+    # Another worker can't claim it until the claim expires
+    assert models.OutgoingEmail.objects.claim() == []
+    models.OutgoingEmail.objects.update(claimed_until=timezone.now())
+    assert models.OutgoingEmail.objects.claim() == claimed
+
+
+@pytest.mark.django_db
+def test_email_batch(user_consent):
+    consents = models.UserConsent.objects.select_related("user", "source")
+    expected = [
+        emails.ConfirmationNeededEmail(user=c.user, consent=c) for c in consents
+    ]
+
+    with mock.patch.object(loader, "get_template", wraps=loader.get_template) as m:
+        batch = emails.EmailBatch(emails.ConfirmationNeededEmail)
+        messages = [batch.create(user=c.user, consent=c) for c in consents]
+    assert m.call_count == 2
+    assert [(m.subject, m.body, m.to) for m in messages] == [
+        (m.subject, m.body, m.to) for m in expected
+    ]
+
+
+@pytest.mark.django_db
+def test_send_campaign_languages(many_consents_per_user):
+    campaign = models.EmailCampaign.objects.create(name="test")
+    campaign.consent.add(*many_consents_per_user["many_consents"])
+
+    def get_language(recipient):
+        return "hi" if recipient.consent_id % 2 else "en"
+
+    with mock.patch.object(
+        translation, "activate", wraps=translation.activate
+    ) as activate:
+        sending.send_campaign(
+            campaign, LanguageEmail, batch_size=100, get_language=get_language
+        )
+    assert len(mail.outbox) == 60
+    # Activated once per language and once when restoring the language after
+    # each group
+    assert activate.call_count == 4
+    for message in mail.outbox:
+        assert message.language == get_language(message.context["recipient"])
+
+
+@pytest.mark.django_db
+def test_send_confirmation_reminders(base_consent, django_assert_max_num_queries):
+    base_consent.requires_confirmed_email = True
+    base_consent.save()
+    overdue = timezone.now() - timedelta(days=30)
+    consents = [
+        models.UserConsent.capture_email_consent(
+            base_consent, get_random_email(), require_confirmation=True
+        )
+        for __ in range(7)
+    ]
+    models.UserConsent.objects.update(email_confirmation_requested=overdue)
+    # Confirmed, recently asked, opted out and reminded too often
+    models.UserConsent.objects.filter(pk=consents[0].pk).update(email_confirmed=True)
+    models.UserConsent.objects.filter(pk=consents[1].pk).update(
+        email_confirmation_requested=timezone.now()
+    )
+    consents[2].optout()
+    models.UserConsent.objects.filter(pk=consents[3].pk).update(
+        email_confirmation_reminders=2
+    )
+    mail.outbox = []
+
+    progress = []
+    # Batches are read with one query each, plus an update per batch
+    with django_assert_max_num_queries(9):
+        sent = sending.send_confirmation_reminders(
+            batch_size=2, progress=lambda sent, elapsed: progress.append(sent)
+        )
+    assert sent == 3
+    assert progress == [2, 3]
+    assert sorted(m.to[0] for m in mail.outbox) == sorted(c.email for c in consents[4:])
+    for consent in consents[4:]:
+        consent.refresh_from_db()
+        assert consent.email_confirmation_reminders == 1
+        assert consent.email_confirmation_requested > overdue
+
+    # Not due again until the delay has passed
+    assert sending.send_confirmation_reminders() == 0
+    # Includes the consent that was recently asked, until each got 2 reminders
+    assert sending.send_confirmation_reminders(delay=0) == 4
+    assert sending.send_confirmation_reminders(delay=0) == 1
+    assert sending.send_confirmation_reminders(delay=0) == 0
+    assert len(mail.outbox) == 8
+
+
+@pytest.mark.django_db
+def test_send_confirmation_reminders_rate(base_consent):
+    base_consent.requires_confirmed_email = True
+    base_consent.save()
+    for __ in range(4):
+        models.UserConsent.capture_email_consent(
+            base_consent, get_random_email(), require_confirmation=True
+        )
+    models.UserConsent.objects.update(
+        email_confirmation_requested=timezone.now() - timedelta(days=30)
+    )
+    with mock.patch.object(sending.time, "sleep") as sleep:
+        assert sending.send_confirmation_reminders(batch_size=2, rate="1/s") == 4
+    # Only between the two batches
+    assert sleep.call_count == 1
+    assert 1 < sleep.call_args[0][0] <= 2
+
+
+class SilentFailBackend(LocmemBackend):
+    """
+    Fails silently for the addresses in ``failing``
+    """
+
+    failing = set()
+
+    def send_messages(self, messages):
+        return super().send_messages(
+            [m for m in messages if not set(m.to) & self.failing]
+        )
+
+
+@pytest.mark.django_db
+def test_send_confirmation_reminders_failed(base_consent):
+    base_consent.requires_confirmed_email = True
+    base_consent.save()
+    consents = [
+        models.UserConsent.capture_email_consent(
+            base_consent, get_random_email(), require_confirmation=True
+        )
+        for __ in range(3)
+    ]
+    models.UserConsent.objects.update(
+        email_confirmation_requested=timezone.now() - timedelta(days=30)
+    )
+    SilentFailBackend.failing = {consents[0].email}
+    connection = SilentFailBackend()
+    assert sending.send_confirmation_reminders(connection=connection) == 2
+    reminders = dict(
+        models.UserConsent.objects.values_list("pk", "email_confirmation_reminders")
+    )
+    assert reminders == {consents[0].pk: 0, consents[1].pk: 1, consents[2].pk: 1}
+
+
+class RaisingBackend(LocmemBackend):
+    """
+    Raises for the addresses in ``failing``, like the SMTP backend does
+    """
+
+    failing = set()
+
+    def send_messages(self, messages):
+        if any(set(m.to) & self.failing for m in messages):
+            raise OSError("Connection refused")
+        return super().send_messages(messages)
+
+
+@pytest.mark.django_db
+def test_send_confirmation_reminders_raises(base_consent):
+    base_consent.requires_confirmed_email = True
+    base_consent.save()
+    consents = [
+        models.UserConsent.capture_email_consent(
+            base_consent, get_random_email(), require_confirmation=True
+        )
+        for __ in range(3)
+    ]
+    models.UserConsent.objects.update(
+        email_confirmation_requested=timezone.now() - timedelta(days=30)
+    )
+    mail.outbox = []
+    RaisingBackend.failing = {consents[2].email}
+    with pytest.raises(OSError):
+        sending.send_confirmation_reminders(connection=RaisingBackend())
+    assert len(mail.outbox) == 2
+    # The reminders that went out before the error are recorded
+    reminders = dict(
+        models.UserConsent.objects.values_list("pk", "email_confirmation_reminders")
+    )
+    assert reminders == {consents[0].pk: 1, consents[1].pk: 1, consents[2].pk: 0}
@@ -0,0 +1,50 @@
+import csv
+import json
+
+import pytest
+from django.contrib import admin
+from django.core.management import call_command
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory
+from django_consent import models
+from django_consent.admin import ConsentSourceAdmin
+
+
+@pytest.mark.django_db
+def test_export_command(user_consent, tmp_path):
+    source = user_consent["base_consent"]
+    valid = {consent.email for consent in source.get_valid_consent()}
+
+    path = tmp_path / "export.csv"
+    call_command("consent_export", source=source.id, output=str(path), chunk_size=3)
+    with path.open(newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert {row["email"] for row in rows} == valid
+
+    path = tmp_path / "export.jsonl"
+    campaign = models.EmailCampaign.objects.create(name="test")
+    campaign.consent.add(source)
+    call_command(
+        "consent_export", campaign=campaign.id, format="jsonl", output=str(path)
+    )
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert {row["email"] for row in rows} == valid
+
+
+@pytest.mark.django_db
+def test_export_admin_action(user_consent, django_assert_num_queries):
+    source_admin = ConsentSourceAdmin(models.ConsentSource, admin.site)
+    queryset = models.ConsentSource.objects.all()
+    request = RequestFactory().post("/")
+
+    # Nothing is read before the download starts
+    with django_assert_num_queries(0):
+        response = source_admin.export_csv(request, queryset)
+    assert isinstance(response, StreamingHttpResponse)
+    assert response["Content-Type"] == "text/csv"
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines[0] == "consent_id,email,email_hash,name"
+    assert len(lines) == 1 + user_consent["base_consent"].get_valid_consent().count()
+
+    response = source_admin.export_jsonl(request, queryset)
+    assert len(list(response.streaming_content)) == len(lines) - 1
@@ -0,0 +1,137 @@
+import socket
+
+import pytest
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail import get_connection
+from django.test import RequestFactory
+from django.urls import reverse
+from django_consent import metrics
+from django_consent import models
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+from .fixtures import get_random_email
+
+
+@pytest.fixture
+def prometheus(monkeypatch):
+    monkeypatch.setattr(
+        consent_settings, "METRICS", {"sink": "django_consent.metrics.PrometheusSink"}
+    )
+    # Other fixtures may have created the default sink
+    metrics._sink = None
+    return metrics.get_sink()
+
+
+def test_null_sink():
+    assert isinstance(metrics.get_sink(), metrics.NullSink)
+    wrapped = metrics.timed("test", lambda value: value * 2)
+    assert wrapped(2) == 4
+
+
+def test_instrument_once():
+    capture = models.UserConsent.__dict__["capture_email_consent"]
+    assert capture.__func__.__wrapped_by_metrics__
+    metrics.instrument()
+    assert models.UserConsent.__dict__["capture_email_consent"] is capture
+    assert utils.get_token_email_hash.__wrapped_by_metrics__
+
+
+def test_statsd_sink(monkeypatch):
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    monkeypatch.setattr(
+        consent_settings,
+        "METRICS",
+        {
+            "sink": "django_consent.metrics.StatsdSink",
+            "host": "127.0.0.1",
+            "port": server.getsockname()[1],
+            "prefix": "test",
+        },
+    )
+    try:
+        metrics.timed("operation", lambda: None)()
+        timing = server.recv(1024).decode()
+        assert timing.startswith("test.operation:") and timing.endswith("|ms")
+        assert server.recv(1024) == b"test.operation:1|c"
+    finally:
+        server.close()
+
+
+def test_errors(prometheus):
+    def fail():
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        metrics.timed("operation", fail)()
+    assert prometheus.counters == {"operation_errors": 1}
+    assert prometheus.histograms == {}
+
+
+def test_prometheus_render(prometheus):
+    prometheus.increment("signup")
+    prometheus.timing("signup", 0.002)
+    prometheus.timing("signup", 10)
+    lines = prometheus.render().splitlines()
+    assert "consent_signup_total 1" in lines
+    assert "# TYPE consent_signup_seconds histogram" in lines
+    assert 'consent_signup_seconds_bucket{le="0.001"} 0' in lines
+    assert 'consent_signup_seconds_bucket{le="0.005"} 1' in lines
+    assert 'consent_signup_seconds_bucket{le="+Inf"} 2' in lines
+    assert "consent_signup_seconds_count 2" in lines
+
+
+def test_prometheus_view(prometheus):
+    request = RequestFactory().get("/metrics/")
+    prometheus.increment("optout", 3)
+    response = metrics.prometheus_view(request)
+    assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"consent_optout_total 3" in response.content
+
+
+def test_prometheus_view_disabled():
+    with pytest.raises(metrics.Http404):
+        metrics.prometheus_view(RequestFactory().get("/metrics/"))
+
+
+@pytest.mark.django_db
+def test_operations(client, user_consent, prometheus, monkeypatch):
+    monkeypatch.setattr(
+        consent_settings,
+        "EMAIL_BACKEND",
+        "django.core.mail.backends.locmem.EmailBackend",
+    )
+    source = models.ConsentSource.objects.first()
+    response = client.post(
+        reverse("signup", kwargs={"source_id": source.id}),
+        data={"email": get_random_email(), "confirmation": True},
+    )
+    assert response.status_code == 302
+
+    consent = source.consents.first()
+    token = utils.get_consent_token(consent, salt=consent_settings.UNSUBSCRIBE_SALT)
+    for token in [token, "invalid"]:
+        client.get(
+            reverse("consent:unsubscribe", kwargs={"pk": consent.id, "token": token})
+        )
+
+    # Already confirmed, so nothing is sent
+    consent.email_confirmation(request=None)
+    get_connection("django_consent.backends.ConsentEmailBackend").send_messages(
+        [EmailMessage("Hi", "Body", to=[consent.email])]
+    )
+    assert len(mail.outbox) == 2
+
+    counters = prometheus.counters
+    assert counters["capture_email_consent"] == 1
+    assert counters["token_validation"] == 2
+    assert counters["token_validation_invalid"] == 1
+    assert counters["optout"] == 1
+    # The signup sent a confirmation email
+    assert counters["email_confirmation"] == 2
+    assert counters["email_render"] == 1
+    assert counters["email_send"] == 1
+    assert set(prometheus.histograms) >= {"capture_email_consent", "email_send"}
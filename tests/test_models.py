@@ -5,6 +5,11 @@ from django.conf import settings
 from django.test.utils import override_settings
 from django.utils import translation
 from django_consent import models
+from django_consent import segments
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+from .fixtures import get_random_email
 
 
 @pytest.mark.django_db
@@ -89,3 +94,281 @@ def test_no_translations(user_consent):
 
         assert str(consent_source.definition_translated) == consent_source.definition
         assert str(consent_source.source_name_translated) == consent_source.source_name
+
+
+@pytest.mark.django_db
+def test_bulk_capture_email_consent(
+    base_consent, create_user, django_assert_max_num_queries
+):
+    active_user = create_user()
+    inactive_user = create_user(is_active=False)
+    emails = [get_random_email() for __ in range(50)]
+    emails += [active_user.email, inactive_user.email, emails[0]]
+
+    progress = []
+    # At most 7 queries per chunk of 20 emails, including savepoints
+    with django_assert_max_num_queries(3 * 7):
+        created = models.UserConsent.bulk_capture_email_consent(
+            base_consent,
+            emails,
+            require_confirmation=True,
+            batch_size=20,
+            progress=lambda *args: progress.append(args),
+        )
+
+    assert created == 52
+    assert progress[-1] == (53, 52)
+    assert base_consent.consents.count() == 52
+    assert base_consent.consents.get(user=active_user).email_confirmed
+    inactive_consent = base_consent.consents.get(user=inactive_user)
+    assert not inactive_consent.email_confirmed
+    assert inactive_consent.email_confirmation_requested
+
+    new_consent = base_consent.consents.get(user__email=emails[1])
+    assert new_consent.email_hash == utils.get_email_hash(emails[1])
+    assert not new_consent.email_confirmed
+    assert not new_consent.user.is_active
+    assert not new_consent.user.has_usable_password()
+
+    # Running the import again does not duplicate anything
+    assert models.UserConsent.bulk_capture_email_consent(base_consent, emails) == 0
+    assert base_consent.consents.count() == 52
+
+
+@pytest.mark.django_db
+def test_materialized_recipients(user_consent, create_user, monkeypatch):
+    source = user_consent["base_consent"]
+
+    def expected():
+        return set(source.consents.valid().values_list("id", flat=True))
+
+    monkeypatch.setattr(consent_settings, "MATERIALIZE_RECIPIENTS", True)
+    models.ConsentRecipient.objects.rebuild()
+    assert set(source.get_valid_consent().values_list("id", flat=True)) == expected()
+
+    consent = source.consents.filter(email_confirmed=False)[0]
+    consent.confirm()
+    assert source.get_valid_consent().filter(id=consent.id).exists()
+
+    consent.optout()
+    assert not source.get_valid_consent().filter(id=consent.id).exists()
+    consent.optouts.all().delete()
+    assert source.get_valid_consent().filter(id=consent.id).exists()
+
+    consent.optout(is_everything=True)
+    assert not source.get_valid_consent().filter(id=consent.id).exists()
+    consent.optouts.all().delete()
+
+    source.requires_active_user = True
+    source.save()
+    user = create_user()
+    active_consent = models.UserConsent.capture_email_consent(source, user.email)
+    assert source.get_valid_consent().filter(id=active_consent.id).exists()
+    user.is_active = False
+    user.save()
+    assert not source.get_valid_consent().filter(id=active_consent.id).exists()
+    user.is_active = True
+    user.save()
+    user.delete()
+    assert not source.get_valid_consent().filter(id=active_consent.id).exists()
+
+    models.UserConsent.capture_email_consent(source, get_random_email())
+    assert set(source.get_valid_consent().values_list("id", flat=True)) == expected()
+    assert models.ConsentRecipient.objects.verify() == []
+
+
+@pytest.mark.django_db
+def test_source_save_recipients(user_consent, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(consent_settings, "MATERIALIZE_RECIPIENTS", True)
+    models.ConsentRecipient.objects.rebuild()
+    source = models.ConsentSource.objects.get(pk=user_consent["base_consent"].pk)
+
+    # Renaming doesn't change which consent is sendable
+    source.source_name = "Renamed"
+    with django_assert_num_queries(1):
+        source.save()
+
+    source.requires_confirmed_email = True
+    source.save()
+    unconfirmed = source.consents.filter(email_confirmed=False)
+    assert not source.get_valid_consent().filter(pk__in=unconfirmed).exists()
+    assert models.ConsentRecipient.objects.verify() == []
+    with django_assert_num_queries(1):
+        source.save()
+
+
+@pytest.mark.django_db
+def test_iter_recipients(user_consent, django_assert_num_queries):
+    source = user_consent["base_consent"]
+    consent = source.consents.order_by("?")[0]
+    consent.user.first_name = "Test"
+    consent.user.last_name = "Person"
+    consent.user.save()
+    consent.optout()
+    valid = list(source.get_valid_consent().order_by("id"))
+    assert len(valid) == 19
+
+    # One query per chunk of 5, the last one being partial
+    with django_assert_num_queries(4):
+        recipients = list(source.iter_recipients(chunk_size=5))
+
+    assert [r.consent_id for r in recipients] == [c.id for c in valid]
+    assert [r.email for r in recipients] == [c.email for c in valid]
+    assert recipients[0].email_hash == valid[0].email_hash
+    assert all(r.name == "" for r in recipients)
+
+    consent.optouts.all().delete()
+    recipient = next(r for r in source.iter_recipients() if r.consent_id == consent.id)
+    assert recipient.name == "Test Person"
+
+
+@pytest.mark.django_db
+def test_campaign_recipients(many_consents, django_assert_num_queries):
+    newsletter, poetry, messages = many_consents
+    campaign = models.EmailCampaign.objects.create(name="test")
+    campaign.consent.add(newsletter, poetry)
+
+    emails = [get_random_email() for __ in range(6)]
+    models.UserConsent.bulk_capture_email_consent(newsletter, emails[:4])
+    models.UserConsent.bulk_capture_email_consent(poetry, emails[2:])
+    models.UserConsent.bulk_capture_email_consent(messages, emails[:1] + emails[5:])
+    models.UserConsent.objects.get(user__email=emails[3], source=poetry).optout()
+
+    def recipient_emails(segment=None):
+        return sorted(c.email for c in campaign.get_recipients(segment))
+
+    # Everyone gets one email even with consent to several sources
+    assert recipient_emails() == sorted(emails)
+
+    with django_assert_num_queries(1):
+        list(campaign.get_recipients())
+
+    segment = (
+        segments.Source(newsletter) | segments.Source(poetry)
+    ) & ~segments.Source(messages)
+    assert recipient_emails(segment) == sorted(emails[1:5])
+    assert recipient_emails(segments.Source(poetry) & segments.Source(newsletter)) == [
+        emails[2]
+    ]
+    assert [r.email for r in campaign.iter_recipients(~segments.Source(poetry))] == [
+        emails[0],
+        emails[1],
+        emails[3],
+    ]
+
+
+@pytest.mark.django_db
+def test_translation_cache(user_consent, django_assert_num_queries):
+    source = models.ConsentSource.objects.get(id=user_consent["base_consent"].id)
+
+    with translation.override("hi"):
+        with django_assert_num_queries(1):
+            assert source.source_name_translated == "test Hindi"
+            assert source.definition_translated == "Testing stuff Hindi"
+            assert source.source_name_translated == "test Hindi"
+
+        source.translations.filter(language_code="hi").update(source_name="stale")
+        with django_assert_num_queries(0):
+            assert source.source_name_translated == "test Hindi"
+
+        hindi = source.translations.get(language_code="hi")
+        hindi.source_name = "updated"
+        hindi.save()
+        assert source.source_name_translated == "updated"
+
+        hindi.delete()
+        assert source.source_name_translated == source.source_name
+
+    sources = list(models.ConsentSource.objects.all())
+    with translation.override("en"):
+        with django_assert_num_queries(1):
+            models.ConsentSource.prefetch_translations(sources)
+            for source in sources:
+                assert source.source_name_translated == "test English"
+
+
+@pytest.mark.django_db
+def test_translation_cache_backend(
+    base_consent, monkeypatch, django_assert_num_queries
+):
+    monkeypatch.setattr(models.translation_cache, "backend", "default")
+    with translation.override("hi"):
+        assert base_consent.source_name_translated == "test Hindi"
+        # Another process would only have the shared cache
+        models.translation_cache.local.clear()
+        with django_assert_num_queries(0):
+            assert base_consent.source_name_translated == "test Hindi"
+
+        base_consent.translations.filter(language_code="hi").delete()
+        models.translation_cache.local.clear()
+        assert base_consent.source_name_translated == base_consent.source_name
+
+
+@pytest.mark.django_db
+def test_with_validity(many_consents_per_user, django_assert_num_queries):
+    newsletter, poetry, messages = many_consents_per_user["many_consents"]
+    poetry.requires_confirmed_email = True
+    poetry.save()
+    consents = models.UserConsent.objects.all()
+    for consent in random.sample(list(consents), 10):
+        consent.optout(is_everything=random.choice([True, False]))
+
+    with django_assert_num_queries(1):
+        validity = {c.id: c.valid for c in consents.with_validity()}
+
+    assert len(validity) == consents.count()
+    for source in many_consents_per_user["many_consents"]:
+        valid_ids = set(source.get_valid_consent().values_list("id", flat=True))
+        assert valid_ids == {c.id for c in source.consents.all() if validity[c.id]}
+        assert source.get_valid_consent().count() == len(valid_ids)
+    assert set(consents.valid().values_list("id", flat=True)) == {
+        consent_id for consent_id, valid in validity.items() if valid
+    }
+
+
+@pytest.mark.django_db
+def test_statistics(base_consent, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(consent_settings, "STATISTICS", True)
+    statistics = models.ConsentStatistics.objects
+
+    consent = models.UserConsent.capture_email_consent(
+        base_consent, get_random_email(), require_confirmation=True
+    )
+    models.UserConsent.bulk_capture_email_consent(
+        base_consent, [get_random_email() for __ in range(5)]
+    )
+    consent.confirm()
+    consent.confirm()
+    consent.optout()
+    consent.optout()
+    assert statistics.totals(source=base_consent) == {
+        "signups": 6,
+        "confirmations": 6,
+        "optouts": 1,
+        "optouts_undone": 0,
+    }
+    assert statistics.count() == 1
+
+    # Counting in an existing bucket is one query
+    with django_assert_num_queries(1):
+        statistics.increment(base_consent.id, optouts_undone=1)
+    assert statistics.totals()["optouts_undone"] == 1
+
+    statistics.rebuild()
+    assert statistics.totals(source=base_consent) == {
+        "signups": 6,
+        "confirmations": 6,
+        "optouts": 1,
+        "optouts_undone": 0,
+    }
+
+
+@pytest.mark.django_db
+def test_statistics_disabled(base_consent, django_assert_num_queries):
+    consent = models.UserConsent.capture_email_consent(
+        base_consent, get_random_email(), require_confirmation=True
+    )
+    with django_assert_num_queries(0):
+        models.ConsentStatistics.objects.increment(base_consent.id, signups=1)
+    consent.confirm()
+    assert not models.ConsentStatistics.objects.exists()
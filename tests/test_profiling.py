@@ -0,0 +1,88 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from django_consent import models
+from django_consent import profiling
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+from .test_async_views import get
+
+
+@pytest.fixture
+def profiled(settings, monkeypatch):
+    settings.MIDDLEWARE = settings.MIDDLEWARE + [
+        "django_consent.profiling.QueryProfilerMiddleware"
+    ]
+    monkeypatch.setattr(consent_settings, "PROFILING_HEADER", True)
+    # Like the handler loading the middleware before any connection is made
+    profiling.install()
+
+
+def get_unsubscribe_url(consent, namespace="consent"):
+    return reverse(
+        namespace + ":unsubscribe",
+        kwargs={
+            "pk": consent.id,
+            "token": utils.get_consent_token(
+                consent, salt=consent_settings.UNSUBSCRIBE_SALT
+            ),
+        },
+    )
+
+
+@pytest.mark.django_db
+def test_profile(user_consent, caplog):
+    caplog.set_level("INFO", logger="django_consent.profiling")
+    with profiling.profile("test") as result:
+        for __ in range(3):
+            models.ConsentSource.objects.filter(pk=1).exists()
+        models.ConsentSource.objects.filter(pk=2).exists()
+        cache.set("profiling", 1)
+        cache.get("profiling")
+        cache.get_many(["profiling", "other"])
+
+    assert result.queries == 4
+    assert result.duplicates == 2
+    assert result.get_duplicate_queries()[0][1] == 3
+    assert result.cache_calls == 3
+    assert result.sql_time > 0
+    assert "test: 4 queries (2 duplicates)" in caplog.text
+    assert "Most duplicated (3 times)" in caplog.text
+
+    # Nothing is counted outside profile()
+    models.ConsentSource.objects.exists()
+    assert result.queries == 4
+
+
+@pytest.mark.django_db
+def test_middleware(client, user_consent, profiled, caplog):
+    caplog.set_level("INFO", logger="django_consent.profiling")
+    consent = models.UserConsent.objects.first()
+    response = client.get(get_unsubscribe_url(consent))
+    assert response.status_code == 200
+    header = dict(part.split("=") for part in response[profiling.HEADER].split(";"))
+    assert int(header["queries"]) > 0
+    assert "GET /" in caplog.text
+
+    # Only consent views are profiled
+    response = client.get(reverse("admin:login"))
+    assert profiling.HEADER not in response
+
+
+@pytest.mark.django_db
+def test_middleware_sampling(client, user_consent, profiled, monkeypatch):
+    monkeypatch.setattr(consent_settings, "PROFILING_SAMPLE_RATE", 0)
+    consent = models.UserConsent.objects.first()
+    response = client.get(get_unsubscribe_url(consent))
+    assert response.status_code == 200
+    assert profiling.HEADER not in response
+
+
+@pytest.mark.django_db
+def test_middleware_async_view(user_consent, profiled):
+    consent = models.UserConsent.objects.first()
+    response = get(get_unsubscribe_url(consent, "consent_async"))
+    assert response.status_code == 200
+    # Queries in sync_to_async() threads are counted
+    assert "queries=0;" not in response[profiling.HEADER]
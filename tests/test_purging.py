@@ -0,0 +1,74 @@
+from datetime import timedelta
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_consent import models
+from django_consent import purging
+
+from .fixtures import get_random_email
+
+
+def capture(source, email=None, **fields):
+    consent = models.UserConsent.capture_email_consent(
+        source, email or get_random_email(), require_confirmation=True
+    )
+    # Signed up a year ago, and was asked to confirm then
+    long_ago = timezone.now() - timedelta(days=365)
+    fields.setdefault("created", long_ago)
+    fields.setdefault("email_confirmation_requested", long_ago)
+    models.UserConsent.objects.filter(pk=consent.pk).update(**fields)
+    return consent
+
+
+@pytest.mark.django_db
+def test_purge_unconfirmed(base_consent, create_user, django_assert_max_num_queries):
+    base_consent.requires_confirmed_email = True
+    base_consent.save()
+    other_source = models.ConsentSource.objects.create(
+        source_name="other", requires_confirmed_email=True
+    )
+    no_confirmation = models.ConsentSource.objects.create(source_name="open")
+
+    stale = [capture(base_consent) for __ in range(3)]
+    opted_out = capture(base_consent)
+    opted_out.optout()
+    # The user still has other consent
+    shared = capture(base_consent)
+    capture(other_source, shared.email, email_confirmed=True)
+    # A real user, who is kept
+    user = create_user()
+    real_user = capture(base_consent, user.email, email_confirmed=False)
+    kept = [
+        capture(base_consent, created=timezone.now()),
+        capture(base_consent, email_confirmed=True),
+        capture(base_consent, email_confirmation_requested=timezone.now()),
+        capture(no_confirmation),
+    ]
+
+    progress = []
+    with mock.patch.object(purging.time, "sleep") as sleep:
+        with django_assert_max_num_queries(50):
+            consents, users = purging.purge_unconfirmed(
+                chunk_size=2,
+                sleep=0.5,
+                progress=lambda consents, users: progress.append(consents),
+            )
+    assert (consents, users) == (6, 4)
+    assert progress == [2, 4, 6]
+    assert sleep.call_count == 2
+
+    User = get_user_model()
+    remaining = set(models.UserConsent.objects.values_list("pk", flat=True))
+    assert remaining == {c.pk for c in kept} | {
+        models.UserConsent.objects.get(source=other_source).pk
+    }
+    assert not User.objects.filter(pk__in=[c.user_id for c in stale]).exists()
+    assert User.objects.filter(pk__in=[shared.user_id, real_user.user_id]).count() == 2
+
+    # The email hash of the opt-out is kept
+    optout = models.EmailOptOut.objects.get(email_hash=opted_out.email_hash)
+    assert optout.consent_id is None and optout.user_id is None
+
+    assert purging.purge_unconfirmed() == (0, 0)
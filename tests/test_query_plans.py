@@ -0,0 +1,94 @@
+"""
+Checks that the queries used for sending and unsubscribing keep using indexes.
+
+If a query starts scanning a whole table, it will become slow once there are
+millions of consents, even though it's fast with the data in our tests.
+"""
+import re
+
+import pytest
+from django.db import connection
+from django_consent import models
+from django_consent import purging
+
+from .fixtures import get_random_email
+
+#: Tables that stay small and may be scanned
+SMALL_TABLES = ["django_consent_consentsource"]
+
+
+def get_full_scans(queryset):
+    """
+    Returns the lines of SQLite's query plan that scan a table, also through
+    all of an index, instead of searching an index
+    """
+    plan = queryset.explain()
+    return [
+        line
+        for line in plan.splitlines()
+        if re.search(r"\bSCAN\b", line)
+        and not any(table in line for table in SMALL_TABLES)
+    ]
+
+
+@pytest.fixture
+def seeded_consent(base_consent):
+    if connection.vendor != "sqlite":
+        pytest.skip("Query plans are only checked on SQLite")
+    # Like in production, each source only has a fraction of all consent
+    for name in ["other", "another"]:
+        models.UserConsent.bulk_capture_email_consent(
+            models.ConsentSource.objects.create(source_name=name),
+            [get_random_email() for __ in range(300)],
+        )
+    models.UserConsent.bulk_capture_email_consent(
+        base_consent, [get_random_email() for __ in range(100)]
+    )
+    models.UserConsent.bulk_capture_email_consent(
+        base_consent,
+        [get_random_email() for __ in range(100)],
+        require_confirmation=True,
+    )
+    for consent in base_consent.consents.order_by("?")[:30]:
+        consent.optout()
+    consent.optout(is_everything=True)
+    # Gives the query planner statistics like a production database has
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return consent
+
+
+@pytest.mark.django_db
+def test_query_plans(seeded_consent):
+    consent = seeded_consent
+    source = consent.source
+    hot_queries = {
+        "get_valid_consent": source.get_valid_consent(),
+        "is_valid optouts": consent.optouts.all(),
+        "is_valid everything": consent.user.email_optouts.filter(is_everything=True),
+        "undo everything": consent.optouts.filter(is_everything=True),
+        "optouts by email_hash": models.EmailOptOut.objects.filter(
+            email_hash=consent.email_hash
+        ),
+        "consent by email_hash": models.UserConsent.objects.filter(
+            email_hash=consent.email_hash
+        ),
+        "valid consent by email_hash": models.UserConsent.objects.filter(
+            email_hash=consent.email_hash
+        ).with_validity(),
+        "unconfirmed consent": models.UserConsent.objects.filter(
+            source=source, email_confirmed=False
+        ),
+        "overdue confirmations": models.UserConsent.objects.filter(
+            email_confirmed=False,
+            email_confirmation_requested__lt=consent.created,
+        ),
+        "confirmation reminders": models.UserConsent.objects.confirmation_overdue(
+            consent.created, 2
+        ).order_by("email_confirmation_requested", "pk"),
+        "stale consent": purging.get_stale_consent(0)
+        .filter(pk__gt=consent.pk)
+        .order_by("pk"),
+    }
+    for name, queryset in hot_queries.items():
+        assert get_full_scans(queryset) == [], name
@@ -0,0 +1,116 @@
+import pytest
+from django.apps import apps as global_apps
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.state import ProjectState
+from django_consent import models
+from django_consent import seeding
+from django_consent import settings as consent_settings
+
+SEED = {
+    "newsletter": {
+        "source_name": "Newsletter",
+        "definition": "You agree to receive our newsletter",
+        "requires_confirmed_email": True,
+        "translations": {
+            "da": {"source_name": "Nyhedsbrev", "definition": "Du accepterer"},
+        },
+    },
+    "members": {"source_name": "Members", "definition": "You are a member"},
+}
+
+
+@pytest.mark.django_db
+def test_seed(django_assert_num_queries):
+    assert seeding.seed(SEED) == (3, 0)
+    newsletter = models.ConsentSource.objects.get(auto_create_id="newsletter")
+    assert newsletter.requires_confirmed_email
+    assert newsletter.translations.get(language_code="da").source_name == ("Nyhedsbrev")
+
+    # Unchanged: One query besides the savepoint
+    with django_assert_num_queries(3):
+        assert seeding.seed(SEED) == (0, 0)
+
+    # Edits in the admin are kept unless updating
+    newsletter.source_name = "Edited"
+    newsletter.save()
+    seed = {
+        "newsletter": dict(
+            SEED["newsletter"],
+            translations={
+                "da": {"source_name": "Nyt", "definition": "Du accepterer"},
+                "en": {"source_name": "News", "definition": "You agree"},
+            },
+        )
+    }
+    assert seeding.seed(seed) == (1, 0)
+    assert models.ConsentSource.get_by_key("newsletter").source_name == "Edited"
+    assert seeding.seed(seed, update=True) == (0, 2)
+    newsletter.refresh_from_db()
+    assert newsletter.source_name == "Newsletter"
+    assert newsletter.modified > newsletter.created
+    assert models.ConsentSource.get_by_key("newsletter").source_name == "Newsletter"
+    assert newsletter.translations.get(language_code="da").source_name == "Nyt"
+
+
+@pytest.mark.django_db
+def test_get_by_key(django_assert_num_queries):
+    seeding.seed(SEED)
+    with django_assert_num_queries(1):
+        source = models.ConsentSource.get_by_key("members")
+        assert models.ConsentSource.get_by_key("members") is source
+    assert source.source_name == "Members"
+
+    models.ConsentSource.objects.get(id=source.id).save()
+    with django_assert_num_queries(1):
+        models.ConsentSource.get_by_key("members")
+
+    with pytest.raises(models.ConsentSource.DoesNotExist):
+        models.ConsentSource.get_by_key("missing")
+
+
+@pytest.mark.django_db
+def test_seed_invalidates_new(django_assert_num_queries):
+    source = models.ConsentSource.objects.create(
+        source_name="Newsletter", definition="Old", auto_create_id="newsletter"
+    )
+    models.ConsentSource.get_by_key("newsletter")
+    # Caches that there's no translation
+    assert source.get_translation("da") is None
+
+    assert seeding.seed(SEED) == (2, 0)
+    assert source.get_translation("da") == ("Nyhedsbrev", "Du accepterer")
+    assert models.ConsentSource.get_by_key("members").source_name == "Members"
+
+
+@pytest.mark.django_db
+def test_post_migrate_seed(monkeypatch):
+    monkeypatch.setattr(consent_settings, "SEED", SEED)
+    migration = MigrationLoader(connection).get_migration(
+        "django_consent", "0001_initial"
+    )
+
+    # Migrating backwards, and to before the current models
+    seeding.post_migrate_seed(
+        None, using="default", apps=global_apps, plan=[(migration, True)]
+    )
+    assert not models.ConsentSource.objects.exists()
+    project_state = ProjectState()
+    seeding.post_migrate_seed(
+        None, using="default", apps=project_state.apps, plan=[(migration, False)]
+    )
+    assert not models.ConsentSource.objects.exists()
+
+    seeding.post_migrate_seed(
+        None, using="default", apps=global_apps, plan=[(migration, False)]
+    )
+    assert models.ConsentSource.objects.count() == 2
+
+    # Changes to the seed are created when no migrations were pending
+    monkeypatch.setattr(
+        consent_settings,
+        "SEED",
+        dict(SEED, events={"source_name": "Events", "definition": "Invitations"}),
+    )
+    seeding.post_migrate_seed(None, using="default", apps=global_apps, plan=[])
+    assert models.ConsentSource.objects.count() == 3
@@ -0,0 +1,86 @@
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import reverse
+from django_consent import settings as consent_settings
+from django_consent import throttling
+
+
+def get_request(ip="127.0.0.1"):
+    return RequestFactory().get("/", REMOTE_ADDR=ip)
+
+
+def test_parse_rate():
+    assert throttling.parse_rate("100/h") == (100, 3600)
+    assert throttling.parse_rate("10/5m") == (10, 300)
+    with pytest.raises(ValueError):
+        throttling.parse_rate("often")
+
+
+def test_two_tier_limiter():
+    limiter = throttling.TwoTierRateLimiter("10/h", sync_threshold=0.5)
+    with mock.patch.object(cache, "incr", wraps=cache.incr) as incr, mock.patch.object(
+        cache, "add", wraps=cache.add
+    ) as add:
+        # Below the threshold, nothing is sent to the cache
+        for __ in range(4):
+            assert not limiter.is_limited(get_request(), "test")
+        assert not add.called and not incr.called
+
+        for __ in range(6):
+            assert not limiter.is_limited(get_request(), "test")
+        assert limiter.is_limited(get_request(), "test")
+        assert not limiter.is_limited(get_request("10.0.0.1"), "test")
+        assert add.called
+
+    # Another process sees the requests synced to the cache
+    other = throttling.TwoTierRateLimiter("10/h", sync_threshold=0.5)
+    for __ in range(4):
+        other.is_limited(get_request(), "test")
+    assert other.is_limited(get_request(), "test")
+
+
+def test_two_tier_limiter_max_keys():
+    limiter = throttling.TwoTierRateLimiter("10/h", max_keys=5)
+    for i in range(20):
+        limiter.is_limited(get_request("10.0.0.{}".format(i)), "test")
+    assert len(limiter._counters) <= 5
+
+
+def test_cache_limiter():
+    limiter = throttling.CacheRateLimiter("2/h")
+    assert not limiter.is_limited(get_request(), "test")
+    assert not limiter.is_limited(get_request(), "test")
+    assert limiter.is_limited(get_request(), "test")
+
+
+@pytest.mark.django_db
+def test_ratelimit_views(client, base_consent, monkeypatch):
+    url = reverse("signup", kwargs={"source_id": base_consent.id})
+    monkeypatch.setattr(consent_settings, "RATELIMIT", "2/h")
+    assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 200
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.wsgi_request.limited
+
+    throttling._limiter = None
+    cache.clear()
+    monkeypatch.setattr(consent_settings, "RATELIMIT", {"rate": "2/h", "block": True})
+    assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 200
+    assert client.get(url).status_code == 403
+
+
+@pytest.mark.django_db
+def test_ratelimit_before_queries(
+    client, base_consent, monkeypatch, django_assert_num_queries
+):
+    url = reverse("signup", kwargs={"source_id": base_consent.id})
+    monkeypatch.setattr(consent_settings, "RATELIMIT", {"rate": "1/h", "block": True})
+    assert client.get(url).status_code == 200
+    # Blocked requests don't look up the source
+    with django_assert_num_queries(0):
+        assert client.get(url).status_code == 403
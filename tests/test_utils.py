@@ -0,0 +1,66 @@
+import pytest
+from django.core import signing
+from django_consent import settings as consent_settings
+from django_consent import utils
+
+
+@pytest.mark.django_db
+def test_consent_token(user_consent):
+    consent = user_consent["user_consents"][0]
+    token = utils.get_consent_token(consent)
+    assert len(token) == utils.TOKEN_LENGTH
+    assert utils.validate_token(token, consent)
+    assert utils.get_token_email_hash(token, consent.id) == consent.email_hash
+
+    # Other consent, salt or a tampered token
+    other = user_consent["user_consents"][1]
+    assert not utils.validate_token(token, other)
+    assert not utils.validate_token(
+        token, consent, salt=consent_settings.UNSUBSCRIBE_ALL_SALT
+    )
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    assert not utils.validate_token(tampered, consent)
+    assert not utils.validate_token("x" * utils.TOKEN_LENGTH, consent)
+    assert not utils.validate_token("short", consent)
+
+
+@pytest.mark.django_db
+def test_legacy_consent_token(user_consent):
+    consent = user_consent["user_consents"][0]
+    token = signing.dumps(
+        str(consent.email_hash) + "," + str(consent.id),
+        salt=consent_settings.UNSUBSCRIBE_SALT,
+    )
+    assert utils.validate_token(token, consent)
+    assert not utils.validate_token(token, user_consent["user_consents"][1])
+
+
+@pytest.mark.django_db
+def test_consent_token_rotation(user_consent, monkeypatch):
+    consent = user_consent["user_consents"][0]
+    monkeypatch.setattr(consent_settings, "TOKEN_KEYS", ["old"])
+    token = utils.get_consent_token(consent)
+
+    monkeypatch.setattr(consent_settings, "TOKEN_KEYS", ["new", "old"])
+    assert utils.validate_token(token, consent)
+    assert utils.get_consent_token(consent) != token
+
+    monkeypatch.setattr(consent_settings, "TOKEN_KEYS", ["new"])
+    assert not utils.validate_token(token, consent)
+
+
+@pytest.mark.django_db
+def test_consent_tokens(user_consent):
+    consents = user_consent["user_consents"]
+    tokens = utils.get_consent_tokens(consents)
+    assert tokens == [utils.get_consent_token(consent) for consent in consents]
+    assert utils.get_consent_tokens(consents, processes=2) == tokens
+
+    recipients = list(
+        utils.iter_recipients(user_consent["base_consent"].consents.all())
+    )
+    recipient_tokens = utils.get_consent_tokens(recipients)
+    for recipient, token in zip(recipients, recipient_tokens):
+        assert utils.get_token_email_hash(token, recipient.consent_id) == (
+            recipient.email_hash
+        )
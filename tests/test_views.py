@@ -1,5 +1,6 @@
 import pytest
 from django.contrib.auth import get_user_model
+from django.core import mail
 from django.urls import reverse
 from django_consent import models
 from django_consent import settings as consent_settings
@@ -37,6 +38,19 @@ def test_signup(client, user_consent):
     ).email_confirmed
 
 
+@pytest.mark.django_db
+def test_signup_outbox(client, user_consent, monkeypatch):
+    monkeypatch.setattr(consent_settings, "EMAIL_OUTBOX", True)
+    source = models.ConsentSource.objects.all().order_by("?")[0]
+    url = reverse("signup", kwargs={"source_id": source.id})
+
+    data = {"email": get_random_email(), "confirmation": True}
+    response = client.post(url, data=data)
+    assert response.status_code == 302
+    assert len(mail.outbox) == 0
+    assert models.OutgoingEmail.objects.get().consent.email == data["email"]
+
+
 @pytest.mark.django_db
 def test_signup_confirmation(client, user_consent):
     """
@@ -259,3 +273,99 @@ def test_consent_confirm(client, user_consent, create_user):
 
     assert response.status_code == 200
     assert models.UserConsent.objects.get(id=consent.id).is_valid()
+
+
+@pytest.mark.django_db
+def test_action_queries(client, user_consent, django_assert_num_queries):
+    """
+    Invalid tokens are rejected without queries, and each action is one query
+    besides loading the consent
+    """
+    consent = models.UserConsent.objects.filter(email_confirmed=False)[0]
+    other = models.UserConsent.objects.exclude(id=consent.id)[0]
+
+    def get(name, salt, consent=consent, token_consent=consent):
+        url = reverse(
+            name,
+            kwargs={
+                "pk": consent.id,
+                "token": utils.get_consent_token(token_consent, salt=salt),
+            },
+        )
+        return client.get(url)
+
+    with django_assert_num_queries(0):
+        response = get("consent:consent_confirm", consent_settings.CONFIRM_SALT, other)
+    assert response.status_code == 404
+    with django_assert_num_queries(0):
+        response = get("consent:unsubscribe", consent_settings.CONFIRM_SALT)
+    assert response.status_code == 404
+
+    with django_assert_num_queries(2):
+        response = get("consent:consent_confirm", consent_settings.CONFIRM_SALT)
+    assert response.status_code == 200
+    assert models.UserConsent.objects.get(id=consent.id).is_valid()
+
+    # Clicking again only loads the consent
+    for queries in [2, 1]:
+        with django_assert_num_queries(queries):
+            response = get("consent:unsubscribe", consent_settings.UNSUBSCRIBE_SALT)
+        assert response.status_code == 200
+    assert consent.optouts.count() == 1
+
+    response = get("consent:unsubscribe_all", consent_settings.UNSUBSCRIBE_ALL_SALT)
+    assert response.status_code == 200
+    assert consent.optouts.count() == 2
+    response = get(
+        "consent:unsubscribe_all_undo", consent_settings.UNSUBSCRIBE_ALL_SALT
+    )
+    assert response.status_code == 200
+    assert consent.optouts.get().is_everything is False
+
+
+@pytest.mark.django_db
+def test_action_statistics(client, user_consent, monkeypatch):
+    monkeypatch.setattr(consent_settings, "STATISTICS", True)
+    consent = models.UserConsent.objects.filter(email_confirmed=False)[0]
+    for name, salt in [
+        ("consent:consent_confirm", consent_settings.CONFIRM_SALT),
+        ("consent:consent_confirm", consent_settings.CONFIRM_SALT),
+        ("consent:unsubscribe", consent_settings.UNSUBSCRIBE_SALT),
+        ("consent:unsubscribe_undo", consent_settings.UNSUBSCRIBE_SALT),
+    ]:
+        url = reverse(
+            name,
+            kwargs={
+                "pk": consent.id,
+                "token": utils.get_consent_token(consent, salt=salt),
+            },
+        )
+        assert client.get(url).status_code == 200
+    assert models.ConsentStatistics.objects.totals(source=consent.source) == {
+        "signups": 0,
+        "confirmations": 1,
+        "optouts": 1,
+        "optouts_undone": 1,
+    }
+
+
+@pytest.mark.django_db
+def test_unsubscribe_deleted_user(client, user_consent, monkeypatch):
+    monkeypatch.setattr(consent_settings, "STATISTICS", True)
+    consent = models.UserConsent.objects.filter(email_confirmed=True)[0]
+    url = reverse(
+        "consent:unsubscribe",
+        kwargs={
+            "pk": consent.id,
+            "token": utils.get_consent_token(
+                consent, salt=consent_settings.UNSUBSCRIBE_SALT
+            ),
+        },
+    )
+    consent.user.delete()
+    # Clicking the link again doesn't opt out again
+    for __ in range(2):
+        assert client.get(url).status_code == 200
+    assert models.EmailOptOut.objects.filter(consent=consent).count() == 1
+    totals = models.ConsentStatistics.objects.totals(source=consent.source)
+    assert totals["optouts"] == 1
@@ -3,8 +3,10 @@ This urlconf exists so we can run tests without an actual
 Django project (Django expects ROOT_URLCONF to exist.)
 It is not used by installed instances of this app.
 """
+from django.contrib import admin
 from django.urls import include
 from django.urls import path
+from django_consent.async_views import AsyncConsentCreateView
 from django_consent.views import ConsentConfirmationSentView
 from django_consent.views import ConsentCreateView
 
@@ -17,4 +19,11 @@ urlpatterns = [
         name="signup_confirmation",
     ),
     path("consent/", include("django_consent.urls")),
+    path("admin/", admin.site.urls),
+    path("async/", include("django_consent.async_urls", namespace="consent_async")),
+    path(
+        "async/signup/<int:source_id>/",
+        AsyncConsentCreateView.as_view(),
+        name="signup_async",
+    ),
 ]